@@ -1,104 +1,180 @@
+from src.startup import import_later, startup  # primero: t0 del reporte de arranque
+
 import asyncio
 import base64
+import json
+import logging
+import multiprocessing
 import os
 import sys
 import time
+from array import array
+from pathlib import Path
+from typing import Dict, Optional
 
-import aiohttp
-import certifi
-import pysher
-
-from config import get_config
-from src.bluetooth_manager import BMPatientMonitor
+from config import Config, DeviceConfig, get_app_data_path, get_store
+from src import commands
 from src.data_parser import BMDataParser
-from src.serial_manager import PM6750USBReader
-
-os.environ["SSL_CERT_FILE"] = get_config()["ssl_cert_file"]
-
+from src.notifier import DataNotifier
+from src.logs import setup_logging
+from src.metrics import MetricsRegistry, MetricsServer
+from src.outbox import Outbox
+from src.runtime import ServiceRuntime
+from src.supervisor import LinkSupervisor
+from src.telemetry import WAVEFORMS, DeltaTracker
+from src.uploader import VitalsUploader
+from src.waveform_codec import encode_channel
+
+log = logging.getLogger("berrymed")
+
+startup.mark("imports")
+
+
+class DeviceSession:
+    """
+    Un equipo BerryMed: su parser, su conexión (BLE o USB) y su loop de
+    envío. El uploader y el outbox son compartidos por todo el proceso.
+    """
+
+    def __init__(
+        self,
+        device_cfg: DeviceConfig,
+        cfg: Config,
+        uploader: VitalsUploader,
+        parser: Optional[BMDataParser] = None,
+    ):
+        self.totem_id = device_cfg.totem_id
+        self.uploader = uploader
+
+        # con DECODE_WORKERS el parser es un RemoteParser del DecodePool
+        self.data_parser = parser or BMDataParser()
+        self.notifier = DataNotifier()
+        # hasta el primer frame pasa por _first_frames (reporte de arranque)
+        self.data_parser.on_frames = self._first_frames
+
+        # cada transporte importa solo lo suyo: USB no carga bleak, BLE no carga serial
+        self.connection = connection = device_cfg.connection
+        if connection == "usb":
+            from src.serial_manager import PM6750USBReader
 
-class VitalsMonitor:
-    def __init__(self):
-        self.data_parser = BMDataParser()
-        cfg = get_config()
-        print(cfg)
-
-        if cfg.get("device_connection", "bt") == "usb":
             self.monitor = PM6750USBReader(
                 parser=self.data_parser,
-                port=cfg.get("device_port", "COM3"),
+                port=device_cfg.port,
+                transport=device_cfg.transport,
+            )
+        elif connection == "replay":
+            from src.capture import ReplayTransport
+
+            # DEVICE_PORT es el archivo de captura a reproducir
+            self.monitor = ReplayTransport(
+                self.data_parser,
+                device_cfg.port,
+                speed=cfg.replay_speed,
+            )
+        elif connection == "sim":
+            from src.simulator import DeviceSimulator, SimulatedTransport
+
+            # equipo simulado en el proceso (pruebas de carga sin hardware)
+            self.monitor = SimulatedTransport(
+                self.data_parser, DeviceSimulator(**device_cfg.sim_options)
             )
         else:
-            self.monitor = BMPatientMonitor(self.data_parser, self.status_callback)
-        
-        # self.monitor = BMPatientMonitor(self.data_parser, self.status_callback)
+            from src.bluetooth_manager import BMPatientMonitor
+
+            self.monitor = BMPatientMonitor(
+                self.data_parser,
+                self.status_callback,
+                address=device_cfg.address,
+                cache_path=get_app_data_path() / "ble_devices.json",
+                cache_key=str(self.totem_id),
+            )
+
+        # grabación opcional de los bytes crudos (CAPTURE_DIR)
+        self.capture = None
+        capture_dir = cfg.capture_dir
+        if capture_dir and connection != "replay":
+            from src.capture import CaptureWriter
+
+            compression = cfg.capture_compression
+            suffix = {"gzip": ".gz", "zstd": ".zst"}.get(compression, "")
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            self.capture = CaptureWriter(
+                Path(capture_dir) / f"{self.totem_id}-{stamp}.bmcap{suffix}",
+                compression=compression,
+                meta={"totem_id": self.totem_id, "connection": connection},
+            )
+            self.monitor.capture = self.capture
+
         self.main_loop = None  # Almacenar el loop principal
 
         # Register callbacks
         self.data_parser.register_callback(
-            "on_ecg_waveform_received", self.handle_ecg_wave
+            "on_ecg_waveform_received", self.handle_ecg_wave, batch=True
         )
         self.data_parser.register_callback(
-            "on_spo2_waveform_received", self.handle_spo2_wave
+            "on_spo2_waveform_received", self.handle_spo2_wave, batch=True
         )
         self.data_parser.register_callback(
-            "on_resp_waveform_received", self.handle_resp_wave
+            "on_resp_waveform_received", self.handle_resp_wave, batch=True
         )
         self.data_parser.register_callback("on_ecg_params_received", self.handle_ecg)
         self.data_parser.register_callback("on_spo2_params_received", self.handle_spo2)
         self.data_parser.register_callback(
             "on_temp_params_received", self.handle_temperature
         )
-        if not isinstance(self.monitor, PM6750USBReader):
+        if connection != "usb":
             self.data_parser.register_callback("on_nibp_params_received", self.handle_nibp)
 
-        # Initialize credentials
-        self.credentials = get_config()
-        if not self.credentials:
-            print("Error: No se encontraron credenciales")
-            sys.exit(1)
-
-        # Initialize Pusher subscriber for public channel
-        print("Initializing Pusher subscriber...")
-        self.pusher_subscriber = pysher.Pusher(
-            key=self.credentials["key"],
-            cluster=self.credentials["cluster"],
-        )
-
-        # Initialize HTTP session for data sending
-        self.api_url = self.credentials["api_url"]
-        self.auth_token = base64.b64encode(
-            f"{self.credentials['api_username']}:{self.credentials['api_password']}".encode()
-        ).decode()
-
-        # Initialize channel names from config
-        self.public_channel = self.credentials["public_channel"]
-        self.start_event_name = self.credentials["start_event_name"]
-        self.stop_event_name = self.credentials["stop_event_name"]
-
         self.is_sending_data = False
+        self.sending_enabled = asyncio.Event()
+        self.flush_interval = cfg.flush_interval
+
+        # detecta enlaces caídos o sin datos y dispara la reconexión
+        self.supervisor = LinkSupervisor(
+            self.monitor,
+            self.data_parser,
+            stall_timeout=cfg.stall_timeout,
+        )
 
-        # Bind connection handlers for the client
-        self.pusher_subscriber.connection.bind(
-            "pusher:connection_established", self.connect_handler
+        # "full": estado completo cada segundo; "delta": solo cambios + keyframes
+        self.upload_mode = cfg.upload_mode
+        # "full": índice (WaveformRing.total) hasta donde ya se envió cada
+        # onda, así cada payload lleva las muestras nuevas sea cual sea el
+        # FLUSH_INTERVAL o si el flush fue urgente
+        self._sent_ref = None
+        self._sent_index: Dict[str, int] = {}
+        self.delta_tracker = DeltaTracker(
+            self.data_parser,
+            keyframe_interval=cfg.keyframe_interval,
+            vitals_format=cfg.vitals_format,
         )
-        self.pusher_subscriber.connect()
+        # "display": vitalSigns con textos de pantalla; "numeric": vitals con números
+        self.vitals_format = cfg.vitals_format
+        # "json": listas de ints; "u8"/"delta": bloques base64 (src/waveform_codec.py)
+        self.waveform_encoding = cfg.waveform_encoding
 
         self.command_queue = asyncio.Queue()
+        self.command_stats = commands.CommandStats()
+
+    def _first_frames(self, urgent: bool):
+        self.data_parser.on_frames = self.notifier.notify
+        startup.first_frame(str(self.totem_id))
+        self.notifier.notify(urgent)
 
     def status_callback(self, message: str):
         """Callback for device status updates"""
-        print(f"[BERRY STATUS] {message}")
+        log.info("[BERRY STATUS][%s] %s", self.totem_id, message)
 
     # Handler methods
-    def handle_ecg_wave(self, value: int):
+    def handle_ecg_wave(self, samples: array, start_index: int, timestamp: float):
         
         pass
 
-    def handle_spo2_wave(self, value: int):
+    def handle_spo2_wave(self, samples: array, start_index: int, timestamp: float):
         
         pass
 
-    def handle_resp_wave(self, value: int):
+    def handle_resp_wave(self, samples: array, start_index: int, timestamp: float):
         
         pass
 
@@ -118,157 +194,584 @@ class VitalsMonitor:
         
         pass
 
-    def connect_handler(self, data):
-        """Handler for successful connection"""
-        print(f"[DEBUG] Connected to Pusher, subscribing to: {self.public_channel}")
-        try:
-            channel = self.pusher_subscriber.subscribe(self.public_channel)
-            if channel:
-                channel.bind(self.start_event_name, self.handle_start_event)
-                channel.bind(self.stop_event_name, self.handle_stop_event)
-                channel.bind('start-blood-pressure', self.handle_blood_pressure_event)
-                print(f"[DEBUG] Successfully subscribed to {self.public_channel}")
-            else:
-                print("[ERROR] Failed to subscribe to channel")
-        except Exception as e:
-            print(f"[ERROR] Subscription error: {e}")
-
+    # ---------- comandos (Pusher) ------------------------------------------
+    # Los handle_* corren en el hilo de Pusher: solo encolan, nunca bloquean.
+    # Todo el estado (is_sending_data, parser, monitor) se toca en el loop,
+    # en orden, desde process_commands.
     def handle_start_event(self, event_data):
         """Handle the start monitoring event"""
-        try:
-            self.is_sending_data = True
-            print("[DEBUG] Starting data transmission")
-        except Exception as e:
-            print(f"[ERROR] Error processing start event: {e}")
+        self._post(commands.START, event_data)
 
     def handle_stop_event(self, event_data):
         """Handle the stop monitoring event"""
-        self.is_sending_data = False
-        if isinstance(self.monitor, PM6750USBReader):
-            self.monitor.reset_state()
-        self.monitor.parser.reset_data()
-        print("[DEBUG] Stopped data transmission")
+        self._post(commands.STOP, event_data)
 
     def handle_blood_pressure_event(self, event_data):
         """Handle the start blood pressure measurement event"""
+        self._post(commands.START_NIBP, event_data)
+
+    def _post(self, name: str, event_data=None):
+        command = commands.Command(name, event_data)
         try:
-            print("[DEBUG] Starting blood pressure measurement")
             if self.main_loop:
-                future = asyncio.run_coroutine_threadsafe(
-                    self.monitor.start_nibp(),
-                    self.main_loop
-                )
-                future.result()  # Espera el resultado
+                self.main_loop.call_soon_threadsafe(self._enqueue, command)
             else:
-                print("[ERROR] Main event loop not initialized")
-        except Exception as e:
-            print(f"[ERROR] Error starting blood pressure measurement: {e}")
+                self._enqueue(command)
+        except RuntimeError as e:
+            log.error("[CMD][%s] Dropping command %s: %s", self.totem_id, name, e)
+
+    def _enqueue(self, command: commands.Command):
+        command.queued_at = time.monotonic()
+        self.command_queue.put_nowait(command)
+
+    async def _execute(self, command: commands.Command):
+        if command.name == commands.START:
+            if not self.is_sending_data:
+                self._start_from_now()
+            self.is_sending_data = True
+            self.sending_enabled.set()
+            log.info("[CMD][%s] Starting data transmission", self.totem_id)
+        elif command.name == commands.STOP:
+            self.is_sending_data = False
+            self.sending_enabled.clear()
+            if self.connection == "usb":
+                self.monitor.reset_state()
+            self.data_parser.reset_data()
+            log.info("[CMD][%s] Stopped data transmission", self.totem_id)
+        elif command.name == commands.START_NIBP:
+            log.info("[CMD][%s] Starting blood pressure measurement", self.totem_id)
+            await self.monitor.start_nibp()
+        else:
+            log.warning("[CMD][%s] Unknown command %s", self.totem_id, command.name)
 
     async def send_data(self):
-        """Send data via HTTP POST"""
-        async with aiohttp.ClientSession() as session:
-            while True:
-                try:
-                    if not self.is_sending_data:
-                        await asyncio.sleep(1)
-                        continue
-
-                    data = self.data_parser.get_current_data()
-                    if not self._is_valid_data(data):
-                        await asyncio.sleep(1)
-                        continue
-
-                    # Prepare the payload
-                    payload = {"timestamp": int(time.time() * 1000), "data": data}
-
-                    # Send data with retry logic
-                    max_retries = 3
-                    for attempt in range(max_retries):
-                        try:
-                            print(f"[DEBUG] Sending data: {data}")
-                            async with session.post(
-                                self.api_url,
-                                json=payload,
-                                headers={
-                                    "Authorization": f"Basic {self.auth_token}",
-                                    "Content-Type": "application/json",
-                                },
-                            ) as response:
-                                if response.status == 200:
-                                    
-                                    print("[DATA] Vital signs sent successfully")
-                                    break
-                                else:
-                                    print(
-                                        f"[ERROR] API returned status {response.status}"
-                                    )
-
-                        except Exception as e:
-                            if attempt == max_retries - 1:
-                                print(
-                                    f"[ERROR] Failed to send data after {max_retries} attempts: {e}"
-                                )
-                            else:
-                                print(
-                                    f"[WARN] Retry attempt {attempt + 1} after error: {e}"
-                                )
-                                await asyncio.sleep(0.5)
-
-                except Exception as e:
-                    print(f"[ERROR] Error in send_data loop: {e}")
-
-                await asyncio.sleep(1)
-
-    def _is_valid_data(self, data):
-        """Check if data contains any valid measurements"""
-        if not data or not isinstance(data, dict):
-            return False
-
-        # Check vital signs
-        vital_signs = data.get("vitalSigns", {})
-        if not vital_signs:
-            return False
-
-        # Check if all vital signs are empty/default
-        default_values = {"-", "- -", "- - /- -"}
-        all_vitals_empty = all(
-            str(value) in default_values for value in vital_signs.values()
-        )
-
-        # Check waveforms
-        spo2_empty = all(v == 0 for v in data.get("spo2", []))
-        ecg_empty = len(data.get("ecg", [])) == 0
-        resp_empty = len(data.get("resp", [])) == 0
+        """
+        Envía cuando hay datos nuevos: a ritmo fijo (flush_interval) para las
+        ondas y enseguida si llega algo urgente (resultado de NIBP, cambio de
+        alarma o estado). Sin datos nuevos o con el envío detenido no hay
+        wakeups.
+        """
+        loop = asyncio.get_running_loop()
+        notifier = self.notifier
+        next_flush = loop.time()
+        while True:
+            try:
+                if not self.is_sending_data:
+                    await self.sending_enabled.wait()
+                    notifier.clear()
+                    next_flush = loop.time() + self.flush_interval
+
+                await notifier.data.wait()
+                remaining = next_flush - loop.time()
+                if remaining > 0 and not notifier.urgent.is_set():
+                    try:
+                        await asyncio.wait_for(notifier.urgent.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                notifier.clear()
+                if not self.is_sending_data:
+                    continue
 
-        # Data is valid only if we have some vital signs OR some non-zero waveform data
-        return not (all_vitals_empty and spo2_empty and ecg_empty and resp_empty)
+                self._flush()
+                next_flush = loop.time() + self.flush_interval
 
-    async def run(self):
-        self.main_loop = asyncio.get_running_loop()  # Guardar referencia al loop principal
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("Error in send_data loop: %s", e)
+                await asyncio.sleep(self.flush_interval)
+
+    def _start_from_now(self):
+        # los rings guardan hasta waveform_seconds de antes del START: el
+        # primer payload arranca en la posición actual (delta y full)
+        rings = self.data_parser.data
+        self._sent_ref = rings
+        self._sent_index = {name: rings[name].total for name in WAVEFORMS}
+        self.delta_tracker.restart()
+
+    def _flush(self):
+        on_success = None
+        on_spooled = None
+        if self.upload_mode == "delta":
+            built = self.delta_tracker.build()
+            if built is None:
+                return
+            payload, marker = built
+            data = payload["data"]
+            on_success = lambda m=marker: self.delta_tracker.ack(m)
+            # en el outbox también cuenta como entregado: las muestras ya
+            # están en un payload que el drain va a reenviar, y no se
+            # vuelven a armar en el próximo delta
+            on_spooled = on_success
+        else:
+            if not self._is_valid_data():
+                return
+            rings = self.data_parser.data
+            if rings is not self._sent_ref:
+                # primer envío o reset_data(): se arranca con el último segundo
+                rates = self.data_parser.WAVEFORM_SAMPLE_RATES
+                self._sent_ref = rings
+                self._sent_index = {
+                    name: max(rings[name].total - rates[name], 0) for name in WAVEFORMS
+                }
+            data = self.data_parser.get_current_data(self.vitals_format, self._sent_index)
+            self._sent_index = {name: rings[name].total for name in WAVEFORMS}
+
+            # Prepare the payload
+            payload = {"timestamp": int(time.time() * 1000), "data": data}
+        if self.waveform_encoding != "json":
+            self._encode_waveforms(data, payload.get("waveformStart"))
+        if self.totem_id is not None:
+            payload["totemId"] = self.totem_id
+
+        # el envío (con reintentos) corre aparte: no frena el tick
+        log.debug("Sending data for totem %s: %s", self.totem_id, self.data_parser.vitals)
+        if not self.uploader.submit(payload, on_success, on_spooled):
+            log.warning("Upload window full, sample queued in outbox")
+
+    def _encode_waveforms(self, data: dict, start: Optional[dict] = None):
+        rings = self.data_parser.data
+        rates = self.data_parser.WAVEFORM_SAMPLE_RATES
+        for name in WAVEFORMS:
+            samples = data[name]
+            first = start[name] if start else rings[name].total - len(samples)
+            data[name] = encode_channel(samples, self.waveform_encoding, rates[name], first)
+
+    def _is_valid_data(self) -> bool:
+        """
+        Hay algo para enviar: algún signo vital medido o muestras de onda
+        (SpO2 distinta de cero). Se mira el VitalsRecord y los rings, sin
+        armar el payload.
+        """
+        parser = self.data_parser
+        if parser.vitals.has_values():
+            return True
+        rings = parser.data
+        if len(rings["ecg"]) or len(rings["resp"]):
+            return True
+        return any(rings["spo2"].snapshot(parser.WAVEFORM_SAMPLE_RATES["spo2"]))
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self.main_loop = loop  # Guardar referencia al loop principal
+        self.notifier.bind(loop)
+        if self.capture is not None:
+            self.capture.open()
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.close()
+
+    def register(self, runtime: ServiceRuntime):
+        """Servicios del equipo: se crean una sola vez, no en cada reconexión."""
+        prefix = f"device[{self.totem_id}]"
+        runtime.add(f"{prefix}.transport", self.run_link)
+        runtime.add(f"{prefix}.sender", self.send_data)
+        runtime.add(f"{prefix}.commands", self.process_commands)
+
+    async def run_link(self):
+        """Conecta, vigila el enlace y reconecta; nunca crea otras tareas."""
         while True:
             try:
-                print("\n[BERRY] Attempting to connect to Berry device...")
+                log.info("[BERRY][%s] Attempting to connect to Berry device...", self.totem_id)
                 connected = await self.monitor.connect()
                 if not connected:
-                    print("[BERRY] Connection failed, retrying in 5 seconds...")
+                    log.warning("[BERRY][%s] Connection failed, retrying in 5 seconds...", self.totem_id)
                     await asyncio.sleep(5)
                     continue
 
-                asyncio.create_task(self.send_data())
-                asyncio.create_task(self.process_commands())
-                print("[BERRY] Connection successful, starting data monitoring...")
-                while True:
-                    await asyncio.sleep(0.1)
+                log.info("[BERRY][%s] Connection successful, starting data monitoring...", self.totem_id)
+                startup.mark(f"{self.totem_id}.connected")
+                try:
+                    reason = await self.supervisor.watch()
+                finally:
+                    # también al cancelar (stop/restart del servicio)
+                    await self.monitor.disconnect()
+                log.warning("[BERRY][%s] Link lost (%s), reconnecting...", self.totem_id, reason)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                print(f"[ERROR] Berry connection error: {str(e)}")
+                log.error("[BERRY][%s] Connection error: %s", self.totem_id, e)
                 await asyncio.sleep(5)
 
     async def process_commands(self):
         while True:
             command = await self.command_queue.get()
-            if command == "start_nibp":
-                await self.monitor.start_nibp()
-            await asyncio.sleep(0.1)
+            command.started_at = time.monotonic()
+            ok = True
+            try:
+                await self._execute(command)
+            except Exception as e:
+                ok = False
+                log.error("[CMD][%s] Command %s failed: %s", self.totem_id, command.name, e)
+            command.finished_at = time.monotonic()
+            self.command_stats.observe(command, ok)
+            log.info(
+                "[CMD][%s] %s: queued %.1f ms, applied %.1f ms after the event",
+                self.totem_id,
+                command.name,
+                command.queue_delay * 1000,
+                command.latency * 1000,
+            )
+
+class VitalsMonitor:
+    """
+    Proceso completo: uno o varios equipos (``DEVICES`` en la config) bajo
+    un mismo loop, compartiendo la sesión HTTP, el outbox y la conexión a
+    Pusher. Los eventos de Pusher se rutean por TOTEM_ID.
+    """
+
+    def __init__(self, config_store=None):
+        # credentials.json se lee una vez; el servicio "config" lo recarga
+        self.config_store = config_store or get_store()
+        cfg = self.config_store.config
+        if not cfg:
+            print("Error: No se encontraron credenciales")
+            sys.exit(1)
+        self.config = cfg
+        self.config_store.subscribe(self._apply_config)
+        startup.mark("config")
+        if cfg.ssl_cert_file:
+            os.environ["SSL_CERT_FILE"] = cfg.ssl_cert_file
+
+        # Initialize HTTP session for data sending
+        self.api_url = cfg.api_url
+        # lo que no se pudo enviar queda en disco y se reenvía al reconectar
+        self.outbox = Outbox(
+            get_app_data_path() / "outbox.sqlite3",
+            max_items=cfg.outbox_max_items,
+            max_age_sec=cfg.outbox_max_age,
+        )
+        self.uploader = VitalsUploader(
+            self.api_url,
+            self._auth_token(cfg),
+            max_in_flight=max(cfg.upload_max_in_flight, 2 * len(cfg.devices)),
+            compress=cfg.upload_gzip,
+            on_failure=self.outbox.put,
+        )
+        # UPLINK "websocket": los equipos envían por el stream y el POST
+        # queda para vaciar el outbox
+        self.stream = None
+        self.uplink = self.uploader
+        if cfg.uplink == "websocket":
+            from src.stream_uploader import StreamUploader
+
+            self.stream = self.uplink = StreamUploader(
+                cfg.stream_url,
+                self._auth_token(cfg),
+                max_pending=cfg.stream_max_pending,
+                heartbeat=cfg.stream_heartbeat,
+                compress=cfg.upload_gzip,
+                on_failure=self.outbox.put,
+            )
+
+        # decodificación opcional en procesos aparte (gateways con muchos equipos)
+        self.decode_pool = None
+        if cfg.decode_workers > 0:
+            from src.decode_pool import DecodePool
+
+            self.decode_pool = DecodePool(cfg.decode_workers)
+
+        self.devices = {}
+        for device_cfg in cfg.devices:
+            parser = None
+            if self.decode_pool:
+                parser = self.decode_pool.parser_for(str(device_cfg.totem_id))
+            device = DeviceSession(device_cfg, cfg, self.uplink, parser)
+            self.devices[str(device.totem_id)] = device
+
+        # Initialize channel names from config
+        self.public_channel = cfg.public_channel
+        self.start_event_name = cfg.start_event_name
+        self.stop_event_name = cfg.stop_event_name
+
+        # el cliente de Pusher se crea en _pusher_service (pysher se importa ahí)
+        self.pusher_subscriber = None
+
+        # transportes, senders, comandos, uploader y Pusher: ver run()
+        self.runtime = ServiceRuntime()
+
+        # contadores de todos los módulos; /metrics solo si METRICS_PORT > 0
+        self.metrics = MetricsRegistry()
+        self.metrics.register(self._collect_metrics)
+        self.metrics_server = None
+        if cfg.metrics_port > 0:
+            self.metrics_server = MetricsServer(self.metrics, port=cfg.metrics_port)
+
+    @staticmethod
+    def _auth_token(cfg: Config) -> str:
+        return base64.b64encode(f"{cfg.api_username}:{cfg.api_password}".encode()).decode()
+
+    def _apply_config(self, old: Config, new: Config):
+        """
+        Suscriptor del ConfigStore: aplica en caliente lo que se puede
+        cambiar sin cortar nada. Un DEVICE_PORT nuevo reconecta solo ese
+        equipo; el resto de los cambios pide reiniciar.
+        """
+        self.config = new
+        pending = []
+        for name in old.changed(new):
+            if name == "api_url":
+                self.api_url = self.uploader.api_url = new.api_url
+            elif name in ("api_username", "api_password"):
+                self.uploader.set_auth_token(self._auth_token(new))
+                if self.stream:
+                    self.stream.set_auth_token(self._auth_token(new))
+            elif name == "upload_gzip":
+                self.uploader.compress = new.upload_gzip
+                if self.stream:
+                    self.stream.compress = new.upload_gzip
+            elif name.startswith("stream_") and self.stream:
+                # heartbeat y compresión valen desde la próxima conexión
+                self.stream.max_pending = new.stream_max_pending
+                self.stream.heartbeat = new.stream_heartbeat
+                if name == "stream_url":
+                    self.stream.url = new.stream_url
+                    self.stream.reconnect()
+            elif name in ("flush_interval", "stall_timeout", "waveform_encoding", "vitals_format"):
+                for device in self.devices.values():
+                    device.flush_interval = new.flush_interval
+                    device.supervisor.stall_timeout = new.stall_timeout
+                    device.waveform_encoding = new.waveform_encoding
+                    device.vitals_format = device.delta_tracker.vitals_format = new.vitals_format
+            elif name == "log_level":
+                logging.getLogger().setLevel(new.log_level)
+            elif name == "devices":
+                pending += self._apply_devices(old.devices, new.devices)
+            elif name not in ("api_bulk_url", "config_poll_interval"):
+                pending.append(name)
+        if pending:
+            log.warning("[CONFIG] Restart to apply: %s", ", ".join(pending))
+
+    def _apply_devices(self, old: tuple, new: tuple) -> list:
+        """Cambios de DEVICES; devuelve los que no se pueden aplicar en caliente."""
+        before = {d.totem_id: d for d in old}
+        after = {d.totem_id: d for d in new}
+        if before.keys() != after.keys():
+            return ["devices (added/removed)"]
+        pending = []
+        for totem_id, cfg in after.items():
+            prev = before[totem_id]
+            if cfg == prev:
+                continue
+            device = self.devices[str(totem_id)]
+            if cfg.port != prev.port and device.connection == "usb":
+                # el resto de los equipos ni se entera
+                device.monitor.port = cfg.port
+                self.runtime.restart(f"device[{totem_id}].transport")
+                log.info("[CONFIG][%s] DEVICE_PORT -> %s, reconnecting", totem_id, cfg.port)
+            if (cfg.connection, cfg.transport, cfg.address, cfg.sim_options) != (
+                prev.connection, prev.transport, prev.address, prev.sim_options
+            ) or (cfg.port != prev.port and device.connection != "usb"):
+                pending.append(f"devices[{totem_id}]")
+        return pending
+
+    async def _config_service(self):
+        await self.config_store.watch(self.config.config_poll_interval)
+
+    def connect_handler(self, data):
+        """Handler for successful connection"""
+        print(f"[DEBUG] Connected to Pusher, subscribing to: {self.public_channel}")
+        try:
+            channel = self.pusher_subscriber.subscribe(self.public_channel)
+            if channel:
+                channel.bind(self.start_event_name, self.handle_start_event)
+                channel.bind(self.stop_event_name, self.handle_stop_event)
+                channel.bind('start-blood-pressure', self.handle_blood_pressure_event)
+                print(f"[DEBUG] Successfully subscribed to {self.public_channel}")
+            else:
+                print("[ERROR] Failed to subscribe to channel")
+        except Exception as e:
+            print(f"[ERROR] Subscription error: {e}")
+
+    def _route(self, event_data) -> list:
+        """
+        Equipos destino de un evento: el del ``totemId`` que venga en el
+        evento o, si no trae ninguno, todos.
+        """
+        totem_id = None
+        try:
+            payload = json.loads(event_data) if isinstance(event_data, str) else event_data
+            if isinstance(payload, dict):
+                totem_id = (
+                    payload.get("totemId")
+                    or payload.get("totem_id")
+                    or payload.get("TOTEM_ID")
+                )
+        except ValueError:
+            pass
+        if totem_id is None:
+            return list(self.devices.values())
+        device = self.devices.get(str(totem_id))
+        if device is None:
+            log.warning("[PUSHER] Event for unknown totem %s", totem_id)
+            return []
+        return [device]
+
+    def handle_start_event(self, event_data):
+        for device in self._route(event_data):
+            device.handle_start_event(event_data)
+
+    def handle_stop_event(self, event_data):
+        for device in self._route(event_data):
+            device.handle_stop_event(event_data)
+
+    def handle_blood_pressure_event(self, event_data):
+        for device in self._route(event_data):
+            device.handle_blood_pressure_event(event_data)
+
+    def stats(self) -> dict:
+        return {
+            "tasks": self.runtime.stats(),
+            "uploader": self.uploader.stats(),
+            "stream": self.stream.stats() if self.stream else None,
+            "links": {key: d.supervisor.stats() for key, d in self.devices.items()},
+            "commands": {key: d.command_stats.as_dict() for key, d in self.devices.items()},
+            "startup": startup.as_dict(),
+        }
+
+    async def _uploader_service(self):
+        """Sesión HTTP compartida + reenvío del outbox."""
+        await self.uploader.start()
+        try:
+            await self.uploader.drain_outbox(
+                self.outbox, bulk_url=self.config.api_bulk_url
+            )
+        finally:
+            await self.uploader.close()
+
+    async def _decoder_service(self):
+        self.decode_pool.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            # join de los workers y del hilo de la cola: fuera del loop
+            await asyncio.to_thread(self.decode_pool.stop)
+
+    async def _pusher_service(self):
+        """Puente con Pusher: su propio hilo, vivo mientras corra el servicio."""
+        if self.pusher_subscriber is None:
+            pysher = await import_later("pysher")
+            # Initialize Pusher subscriber for public channel
+            print("Initializing Pusher subscriber...")
+            self.pusher_subscriber = pysher.Pusher(
+                key=self.config.key,
+                cluster=self.config.cluster,
+            )
+            # Bind connection handlers for the client
+            self.pusher_subscriber.connection.bind(
+                "pusher:connection_established", self.connect_handler
+            )
+        self.pusher_subscriber.connect()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.pusher_subscriber.disconnect()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        # el outbox abre (y purga lo vencido) en su hilo
+        await asyncio.to_thread(self.outbox.open)
+        for device in self.devices.values():
+            device.bind(loop)
+
+        runtime = self.runtime
+        runtime.add("uploader", self._uploader_service)
+        if self.stream:
+            runtime.add("stream", self.stream.run)
+        if self.decode_pool:
+            # los rings no sobreviven a stop(): si el pool cae, cae el proceso
+            runtime.add("decoder", self._decoder_service, restart=False)
+        for device in self.devices.values():
+            device.register(runtime)
+        # último: los eventos solo llegan con todo lo demás en marcha
+        runtime.add("pusher", self._pusher_service)
+        if self.metrics_server:
+            runtime.add("metrics", self.metrics_server.serve)
+        if self.config.config_poll_interval > 0:
+            runtime.add("config", self._config_service)
+        startup.expect(self.devices)
+        startup.mark("services")
+        try:
+            await runtime.run()
+        finally:
+            for device in self.devices.values():
+                device.close()
+            # espera las escrituras encoladas (p. ej. lo que el stream no confirmó)
+            await asyncio.to_thread(self.outbox.close)
+
+    def _collect_metrics(self):
+        """Collector del MetricsRegistry: lee los contadores de cada objeto."""
+        for key, device in self.devices.items():
+            dev = {"device": key}
+            parser = device.data_parser
+            for packet_type, n in enumerate(parser.frames_by_type):
+                if n:
+                    name = parser.callbacks.get(packet_type, (f"0x{packet_type:02X}",))[0]
+                    yield ("frames_total", "counter", "Frames decoded by packet type",
+                           {**dev, "type": f"0x{packet_type:02X}", "callback": name}, n)
+            yield ("checksum_failures_total", "counter", "Frames dropped by checksum",
+                   dev, parser.checksum_failures)
+            yield ("resync_bytes_total", "counter", "Bytes skipped while resyncing",
+                   dev, parser.bytes_resynced)
+            if self.decode_pool:
+                yield ("decode_ring_overflows_total", "counter",
+                       "Device reads dropped because the decode ring was full",
+                       dev, parser.ring_overflows)
+
+            monitor = device.monitor
+            yield ("transport_chunks_total", "counter", "USB reads / BLE notifications",
+                   dev, monitor.chunks_received)
+            yield ("transport_bytes_total", "counter", "Bytes received from the device",
+                   dev, monitor.bytes_received)
+            if device.connection == "usb":
+                yield ("usb_read_size_bytes", "histogram", "Bytes per USB read",
+                       dev, monitor.read_sizes)
+            link = device.supervisor
+            yield ("link_chunk_rate", "gauge", "Chunks per second on the link", dev, link.chunk_rate)
+            yield ("link_frame_rate", "gauge", "Decoded frames per second", dev, link.fps)
+            yield ("link_stalls_total", "counter", "Reconnects due to stalls", dev, link.stalls)
+
+            cmd_stats = device.command_stats
+            for name, n in cmd_stats.counts.items():
+                yield ("commands_total", "counter", "Pusher commands applied",
+                       {**dev, "command": name}, n)
+            yield ("command_latency_seconds", "histogram", "Pusher event to device latency",
+                   dev, cmd_stats.latency)
+
+        uploader = self.uploader
+        yield ("upload_latency_seconds", "histogram", "API request latency", {}, uploader.latency)
+        for field in ("sent", "failed", "retries", "rejected", "drained"):
+            yield (f"upload_{field}_total", "counter", f"Uploads {field}", {},
+                   getattr(uploader, field))
+        yield ("upload_in_flight", "gauge", "POSTs in flight", {}, uploader.in_flight)
+        try:
+            depth = len(self.outbox)
+        except Exception:
+            depth = None            # outbox sin abrir
+        yield ("outbox_depth", "gauge", "Payloads waiting in the outbox", {}, depth)
+        yield ("outbox_evicted_total", "counter", "Payloads evicted from the outbox",
+               {}, self.outbox.evicted)
+
+        stream = self.stream
+        if stream:
+            yield ("stream_latency_seconds", "histogram", "Stream submit to ack latency",
+                   {}, stream.latency)
+            for field in ("sent", "failed", "rejected", "resent", "reconnects"):
+                yield (f"stream_{field}_total", "counter", f"Stream messages/connections {field}",
+                       {}, getattr(stream, field))
+            yield ("stream_pending", "gauge", "Stream messages waiting for an ack",
+                   {}, stream.in_flight)
+            yield ("stream_connected", "gauge", "Stream is connected", {}, int(stream.connected))
+
+        for phase, sec in startup.as_dict().items():
+            yield ("startup_seconds", "gauge", "Seconds from start to each startup phase",
+                   {"phase": phase}, sec)
+
+        for name, task in self.runtime.stats().items():
+            yield ("task_restarts_total", "counter", "Service restarts",
+                   {"task": name}, task["restarts"])
+            yield ("task_running", "gauge", "Service is running",
+                   {"task": name}, task["running"])
 
 
 async def main():
@@ -281,4 +784,10 @@ async def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # workers de DecodePool en el .exe
+    _cfg = get_store().config
+    if _cfg:
+        setup_logging(_cfg.log_level, _cfg.log_rate_limit)
+    else:
+        setup_logging()
     asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Decodificación en procesos: frames/s totales y dispositivos por core.
+
+    poetry run python benchmarks/bench_decode_pool.py [--devices N] [--workers 0,1,2,4]
+
+Cada dispositivo recibe el mismo stream sintético en chunks de 256 bytes
+lo más rápido posible durante ``--seconds``. ``workers=0`` decodifica en
+el loop (BMDataParser normal). "devices/core" es cuántos equipos a
+``--device-rate`` frames/s entrarían por cada core usado.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_framing import make_stream  # noqa: E402
+from src.data_parser import BMDataParser  # noqa: E402
+from src.decode_pool import DecodePool  # noqa: E402
+
+
+async def run(workers: int, devices: int, seconds: float, chunks):
+    pool = None
+    if workers:
+        pool = DecodePool(workers)
+        parsers = [pool.parser_for(f"dev{i}") for i in range(devices)]
+        pool.start()
+        await asyncio.sleep(1.0)            # arranque de los procesos
+    else:
+        parsers = [BMDataParser() for _ in range(devices)]
+
+    start = time.perf_counter()
+    deadline = start + seconds
+    idx = 0
+    while time.perf_counter() < deadline:
+        chunk = chunks[idx % len(chunks)]
+        idx += 1
+        for parser in parsers:
+            if not workers:
+                parser.add_data(chunk)
+                continue
+            # con workers, el ritmo lo marca la decodificación: si el ring
+            # está lleno se cede el loop (y se aplican resultados)
+            while not parser.try_add_data(chunk):
+                await asyncio.sleep(0.001)
+        if workers and idx % 16 == 0:
+            await asyncio.sleep(0)
+    await asyncio.sleep(0.5 if workers else 0)
+    elapsed = time.perf_counter() - start
+
+    frames = sum(p.frames_decoded for p in parsers)
+    if pool:
+        pool.stop()
+    return frames / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--devices", type=int, default=8)
+    ap.add_argument("--workers", default="0,1,2,4")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--device-rate", type=float, default=500.0,
+                    help="frames/s de un PM-6750 con todas las ondas activas")
+    args = ap.parse_args()
+
+    stream = make_stream(20_000)
+    chunks = [stream[i:i + 256] for i in range(0, len(stream), 256)]
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        fps = asyncio.run(run(workers, args.devices, args.seconds, chunks))
+        cores = min(max(workers, 1), os.cpu_count() or 1)
+        per_core = fps / args.device_rate / cores
+        print(f"workers={workers}: {fps:12,.0f} frames/s  {per_core:7.1f} devices/core")
+
+
+if __name__ == "__main__":
+    main()
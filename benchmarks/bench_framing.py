@@ -0,0 +1,105 @@
+"""
+Framing USB: doble parseo (lector + parser) vs. una sola pasada.
+
+    poetry run python benchmarks/bench_framing.py [--frames N] [--read-size B]
+
+"before" reproduce el _loop anterior de PM6750USBReader: re-armaba cada
+frame sobre un bytearray (pop(0) / slicing) y después se lo pasaba al
+parser, que lo volvía a buscar. "after" entrega las lecturas crudas al
+parser, como hace ahora el lector.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_parser import BMDataParser  # noqa: E402
+
+HEADER = b"\x55\xAA"
+
+
+def make_frame(packet_type: int, payload: bytes) -> bytes:
+    body = bytes([len(payload) + 3, packet_type]) + payload
+    return HEADER + body + bytes([~sum(body) & 0xFF])
+
+
+def make_stream(n_frames: int, seed: int = 1) -> bytes:
+    """Mezcla típica del PM-6750: mayoría de ondas, algunos parámetros."""
+    rnd = random.Random(seed)
+    frames = []
+    for i in range(n_frames):
+        if i % 50 == 0:
+            frames.append(make_frame(0x02, bytes([0, 72, 16])))
+        elif i % 50 == 25:
+            frames.append(make_frame(0x04, bytes([0, 98, 72])))
+        else:
+            packet_type = rnd.choice((0x01, 0x01, 0xFE, 0xFF))
+            if packet_type == 0x01:
+                frames.append(make_frame(0x01, bytes([0, rnd.randrange(256)])))
+            else:
+                frames.append(make_frame(packet_type, bytes([rnd.randrange(256)])))
+    return b"".join(frames)
+
+
+def new_parser():
+    parser = BMDataParser()
+    counter = [0]
+
+    def count(*_):
+        counter[0] += 1
+
+    for name, _ in list(parser.callbacks.values()):
+        parser.register_callback(name, count)
+    return parser, counter
+
+
+def legacy_loop(chunks, parser):
+    """_loop anterior de PM6750USBReader (incluido su largo n + 3)."""
+    buf = bytearray()
+    for data in chunks:
+        buf.extend(data)
+        while len(buf) >= 3:
+            if buf[:2] != HEADER:
+                buf.pop(0)
+                continue
+            n = buf[2]
+            if len(buf) < n + 3:
+                break
+            frame = bytes(buf[: n + 3])
+            buf = buf[n + 3:]
+            parser.add_data(frame)
+
+
+def single_pass(chunks, parser):
+    for data in chunks:
+        parser.add_data(data)
+
+
+def run(fn, chunks, n_frames):
+    parser, counter = new_parser()
+    start = time.perf_counter()
+    fn(chunks, parser)
+    elapsed = time.perf_counter() - start
+    return n_frames / elapsed, counter[0]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--frames", type=int, default=200_000)
+    ap.add_argument("--read-size", type=int, default=256)
+    args = ap.parse_args()
+
+    stream = make_stream(args.frames)
+    step = args.read_size
+    chunks = [stream[i:i + step] for i in range(0, len(stream), step)]
+
+    for label, fn in (("before", legacy_loop), ("after", single_pass)):
+        fps, decoded = run(fn, chunks, args.frames)
+        print(f"{label:>6}: {fps:12,.0f} frames/s  ({decoded}/{args.frames} frames decoded)")
+
+
+if __name__ == "__main__":
+    main()
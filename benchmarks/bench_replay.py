@@ -0,0 +1,64 @@
+"""
+Decodifica una captura (src.capture) lo más rápido posible.
+
+    poetry run python benchmarks/bench_replay.py CAPTURA [--repeat N]
+    poetry run python benchmarks/bench_replay.py --synthetic out.bmcap.gz
+
+La misma captura da siempre los mismos frames: sirve para comparar
+frames/s entre versiones con tráfico real. ``--synthetic`` graba un
+stream sintético en chunks de 20 bytes cada 5 ms (como BLE) para probar
+sin equipo.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_framing import make_stream, new_parser  # noqa: E402
+from src.capture import CaptureWriter, read_capture  # noqa: E402
+
+
+def write_synthetic(path: str, frames: int) -> None:
+    compression = "gzip" if path.endswith(".gz") else "zstd" if path.endswith(".zst") else None
+    stream = make_stream(frames)
+    with CaptureWriter(path, compression, meta={"synthetic": True}) as capture:
+        for n, i in enumerate(range(0, len(stream), 20)):
+            capture.write(stream[i:i + 20], offset=n * 0.005)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("capture")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--synthetic", action="store_true",
+                    help="grabar una captura sintética en CAPTURA y salir")
+    ap.add_argument("--frames", type=int, default=50_000)
+    args = ap.parse_args()
+
+    if args.synthetic:
+        write_synthetic(args.capture, args.frames)
+        return
+
+    meta, chunks = read_capture(args.capture)
+    chunks = [data for _, data in chunks]
+    total = sum(len(c) for c in chunks)
+    print(f"{args.capture}: {len(chunks)} chunks, {total} bytes, meta={meta}")
+
+    for _ in range(args.repeat):
+        parser, counter = new_parser()
+        start = time.perf_counter()
+        for data in chunks:
+            parser.add_data(data)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{parser.frames_decoded / elapsed:12,.0f} frames/s  "
+            f"({parser.frames_decoded} frames, {parser.checksum_failures} bad, "
+            f"{parser.bytes_resynced} bytes resynced, {counter[0]} callbacks)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Carga con el simulador (src.simulator): throughput, latencia y escala.
+
+    poetry run python benchmarks/bench_simulator.py [--seconds S] [--devices 1,8,32]
+
+– throughput: frames/s del parser con 0 %, 1 % y 5 % de frames corruptos
+  o con basura, en chunks de 20 bytes (BLE) y 256 bytes (USB)
+– latencia: frame escrito en un pty -> decodificado por PM6750USBReader
+  (transporte asyncio), p50/p99
+– escala: N equipos simulados en tiempo real en un mismo loop; % de CPU
+  por equipo y cuántos entran por core
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_framing import new_parser  # noqa: E402
+from src.data_parser import BMDataParser  # noqa: E402
+from src.simulator import DeviceSimulator, SimulatedTransport, make_frame  # noqa: E402
+
+
+def throughput(seconds: float):
+    for rate in (0.0, 0.01, 0.05):
+        sim = DeviceSimulator(corrupt_rate=rate, garbage_rate=rate, seed=1)
+        stream = sim.generate(seconds)
+        for step in (20, 256):
+            chunks = [stream[i:i + step] for i in range(0, len(stream), step)]
+            parser, _ = new_parser()
+            start = time.perf_counter()
+            for data in chunks:
+                parser.add_data(data)
+            elapsed = time.perf_counter() - start
+            print(
+                f"  corrupt {rate:4.0%} chunk {step:3d} B: {parser.frames_decoded / elapsed:10,.0f} frames/s"
+                f"  ({parser.frames_decoded}/{sim.frames} ok, {parser.bytes_resynced} B resynced)"
+            )
+
+
+async def latency(samples: int):
+    import pty
+    import tty
+
+    from src.serial_manager import PM6750USBReader
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    parser = BMDataParser()
+    reader = PM6750USBReader(parser, port=os.ttyname(slave), transport="asyncio")
+    decoded = asyncio.Event()
+    parser.on_frames = lambda urgent: decoded.set()
+    if not await reader.connect():
+        print("  no se pudo abrir el pty")
+        return
+    os.read(master, 4096)                   # comandos de start_monitoring
+
+    frame = make_frame(0xFE, b"\x64")
+    results = []
+    for _ in range(samples):
+        decoded.clear()
+        start = time.perf_counter()
+        os.write(master, frame)
+        await decoded.wait()
+        results.append(time.perf_counter() - start)
+    await reader.disconnect()
+    os.close(master)
+    os.close(slave)
+
+    results.sort()
+    p50 = results[len(results) // 2] * 1e6
+    p99 = results[int(len(results) * 0.99)] * 1e6
+    print(f"  pty -> frame decodificado: p50 {p50:.0f} µs  p99 {p99:.0f} µs  ({samples} frames)")
+
+
+async def scaling(devices: int, seconds: float):
+    transports = [SimulatedTransport(BMDataParser(), DeviceSimulator(seed=i)) for i in range(devices)]
+    for transport in transports:
+        await transport.connect()
+    wall, cpu = time.perf_counter(), time.process_time()
+    await asyncio.sleep(seconds)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    for transport in transports:
+        await transport.disconnect()
+
+    frames = sum(t.parser.frames_decoded for t in transports)
+    per_device = cpu / wall / devices
+    print(
+        f"  {devices:3d} equipos: {frames / wall:9,.0f} frames/s  "
+        f"CPU {per_device:6.2%} por equipo  ~{1 / per_device if per_device else float('inf'):,.0f} equipos/core"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--devices", default="1,8,32")
+    ap.add_argument("--latency-samples", type=int, default=2000)
+    args = ap.parse_args()
+
+    print("throughput (stream simulado de", args.seconds * 20, "s)")
+    throughput(args.seconds * 20)
+    if os.name == "posix":
+        print("latencia")
+        asyncio.run(latency(args.latency_samples))
+    print("escala")
+    for n in (int(d) for d in args.devices.split(",")):
+        asyncio.run(scaling(n, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Uplink por WebSocket (src.stream_uploader) contra un server aiohttp local.
+
+    poetry run python benchmarks/bench_stream.py [--rate 20] [--seconds 5]
+
+– latencia submit -> ack del stream contra un POST por payload
+  (VitalsUploader) al mismo server, con el payload de un segundo de ondas
+– reanudación: el server corta la conexión varias veces; tienen que
+  llegar todos los seq, en orden y sin duplicados
+– backpressure: el server deja de confirmar; ``submit`` rechaza al
+  llegar a ``max_pending`` y lo rechazado va a ``on_failure``
+
+``StreamServer`` es una implementación mínima del lado del server del
+protocolo (hello/welcome, data, ack) para probar contra algo real.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import WSMsgType, web  # noqa: E402
+
+from src.data_parser import BMDataParser  # noqa: E402
+from src.simulator import DeviceSimulator  # noqa: E402
+from src.stream_uploader import StreamUploader  # noqa: E402
+from src.uploader import VitalsUploader  # noqa: E402
+
+
+class StreamServer:
+    """Server de referencia: guarda lo recibido por stream y confirma cada mensaje."""
+
+    def __init__(self, ack: bool = True):
+        self.ack = ack
+        self.received = {}          # stream -> [seq, ...]
+        self.sockets = set()
+
+    async def handle(self, request):
+        ws = web.WebSocketResponse(heartbeat=10)
+        await ws.prepare(request)
+        hello = json.loads((await ws.receive()).data)
+        seqs = self.received.setdefault(hello["stream"], [])
+        await ws.send_str(json.dumps({"type": "welcome", "ack": seqs[-1] if seqs else 0}))
+        self.sockets.add(ws)
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                data = json.loads(msg.data)
+                if data["type"] != "data" or (seqs and data["seq"] <= seqs[-1]):
+                    continue        # duplicado de un reenvío
+                seqs.append(data["seq"])
+                if self.ack:
+                    await ws.send_str(json.dumps({"type": "ack", "seq": data["seq"]}))
+        finally:
+            self.sockets.discard(ws)
+        return ws
+
+    async def drop_all(self):
+        for ws in list(self.sockets):
+            await ws.close()
+
+
+async def serve(server: StreamServer):
+    async def post(request):
+        await request.read()
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/stream", server.handle)
+    app.router.add_post("/vitals", post)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner, runner.addresses[0][1]
+
+
+def sample_payload() -> dict:
+    parser = BMDataParser()
+    for name, _ in list(parser.callbacks.values()):
+        parser.register_callback(name, lambda *args: None)
+    parser.add_data(DeviceSimulator(seed=1).generate(3.0))
+    return {"timestamp": int(time.time() * 1000), "data": parser.get_current_data()}
+
+
+def percentiles(values):
+    values = sorted(values)
+    return values[len(values) // 2] * 1000, values[int(len(values) * 0.99)] * 1000
+
+
+async def latency(rate: float, seconds: float):
+    server = StreamServer()
+    runner, port = await serve(server)
+    payload = sample_payload()
+    n = int(rate * seconds)
+
+    stream = StreamUploader(f"http://127.0.0.1:{port}/stream", "token")
+    task = asyncio.create_task(stream.run())
+    while not stream.connected:
+        await asyncio.sleep(0.01)
+    stream_lat = []
+    for _ in range(n):
+        acked = asyncio.Event()
+        start = time.perf_counter()
+        stream.submit(payload, acked.set)
+        await acked.wait()
+        stream_lat.append(time.perf_counter() - start)
+        await asyncio.sleep(1 / rate)
+    task.cancel()
+
+    uploader = VitalsUploader(f"http://127.0.0.1:{port}/vitals", "token")
+    await uploader.start()
+    post_lat = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await uploader.post(payload)
+        post_lat.append(time.perf_counter() - start)
+        await asyncio.sleep(1 / rate)
+    await uploader.close()
+    await runner.cleanup()
+
+    for name, values in (("websocket", stream_lat), ("POST", post_lat)):
+        p50, p99 = percentiles(values)
+        print(f"  {name:<9} p50 {p50:6.2f} ms  p99 {p99:6.2f} ms  ({n} payloads a {rate:g}/s)")
+
+
+async def resume(rate: float, seconds: float):
+    server = StreamServer()
+    runner, port = await serve(server)
+    stream = StreamUploader(f"http://127.0.0.1:{port}/stream", "token", reconnect_base=0.05)
+    task = asyncio.create_task(stream.run())
+    n = int(rate * seconds)
+    for i in range(n):
+        stream.submit({"i": i})
+        if i and i % (n // 4) == 0:
+            await server.drop_all()
+        await asyncio.sleep(1 / rate)
+    while stream.in_flight:
+        await asyncio.sleep(0.05)
+    task.cancel()
+    await runner.cleanup()
+
+    seqs = server.received[stream.stream_id]
+    ok = seqs == list(range(1, n + 1))
+    print(
+        f"  {len(seqs)}/{n} recibidos {'en orden, sin duplicados' if ok else 'CON HUECOS O DUPLICADOS'}; "
+        f"{stream.reconnects} reconexiones, {stream.resent} reenviados"
+    )
+
+
+async def backpressure():
+    server = StreamServer(ack=False)
+    runner, port = await serve(server)
+    failed = []
+    stream = StreamUploader(
+        f"http://127.0.0.1:{port}/stream", "token", max_pending=50, on_failure=failed.append
+    )
+    task = asyncio.create_task(stream.run())
+    accepted = sum(stream.submit({"i": i}) for i in range(200))
+    await asyncio.sleep(0.2)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    await runner.cleanup()
+    print(
+        f"  {accepted} aceptados, {stream.rejected} rechazados; "
+        f"{len(failed)} a on_failure (rechazados + pendientes al cerrar)"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rate", type=float, default=20.0, help="payloads por segundo")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    print("latencia")
+    asyncio.run(latency(args.rate, args.seconds))
+    print("reanudación")
+    asyncio.run(resume(args.rate * 5, args.seconds))
+    print("backpressure")
+    asyncio.run(backpressure())
+
+
+if __name__ == "__main__":
+    main()
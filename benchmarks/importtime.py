@@ -0,0 +1,124 @@
+"""
+Tiempo de import por modo de conexión (``python -X importtime``).
+
+    poetry run python benchmarks/importtime.py            # compara con el baseline
+    poetry run python benchmarks/importtime.py --update   # guarda el baseline
+    poetry run python benchmarks/importtime.py --top 15   # los módulos más caros
+
+Cada caso corre en un proceso nuevo (``--repeat`` veces, se queda con el
+más rápido) y suma el tiempo acumulado de los imports de primer nivel.
+Falla si el total sube más de ``--threshold`` (30 %) o si se importan
+módulos de más: eso último no depende de la máquina y es lo que delata
+un import que dejó de ser lazy. Sale con código 1 si algún caso falla.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "importtime_baseline.json")
+
+# lo que carga el proceso antes de conectar cada tipo de equipo
+CASES = {
+    "app": "import app",
+    "usb": "import app, src.serial_manager",
+    "bt": "import app, src.bluetooth_manager",
+    "replay": "import app, src.capture",
+    "sim": "import app, src.simulator",
+    # lo que se importa después, desde los servicios
+    "uploader": "import aiohttp",
+    "pusher": "import pysher",
+}
+
+
+def profile(code: str) -> list:
+    """``[(módulo, self µs, acumulado µs, nivel)]`` de un proceso nuevo."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode:
+        last = proc.stderr.strip().splitlines()[-1:] or ["failed"]
+        raise ImportError(last[0])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative), depth))
+    return rows
+
+
+def measure(code: str, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        rows = profile(code)
+        total = sum(cum for _, _, cum, depth in rows if depth == 0)
+        if best is None or total < best[0]:
+            best = total, rows
+    total, rows = best
+    top = sorted(((cum, name) for name, _, cum, _ in rows), reverse=True)
+    return {
+        "total_ms": round(total / 1000, 1),
+        "modules": len(rows),
+        "top": [[name, round(cum / 1000, 1)] for cum, name in top],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("cases", nargs="*", default=list(CASES))
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update", action="store_true", help="guardar los resultados como baseline")
+    ap.add_argument("--threshold", type=float, default=0.30)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=5, help="módulos más caros a mostrar por caso")
+    args = ap.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, failed = {}, []
+    print(f"{'case':<10} {'total ms':>9} {'modules':>8}  status")
+    for name in args.cases:
+        try:
+            result = measure(CASES[name], args.repeat)
+        except ImportError as e:
+            print(f"{name:<10} skipped ({e})")
+            continue
+        results[name] = {k: result[k] for k in ("total_ms", "modules")}
+        status = "new"
+        base = baseline.get(name)
+        if base:
+            problems = []
+            if result["total_ms"] > base["total_ms"] * (1 + args.threshold):
+                problems.append(f"{result['total_ms']} ms > {base['total_ms']} ms +{args.threshold:.0%}")
+            if result["modules"] > base["modules"]:
+                problems.append(f"{result['modules'] - base['modules']} more modules")
+            status = "FAIL: " + "; ".join(problems) if problems else "ok"
+            if problems:
+                failed.append(name)
+        print(f"{name:<10} {result['total_ms']:>9.1f} {result['modules']:>8}  {status}")
+        for module, ms in result["top"][:args.top]:
+            print(f"{'':<10} {ms:>9.1f}  {module}")
+
+    if args.update:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if failed:
+        print(f"{len(failed)} regression(s): {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
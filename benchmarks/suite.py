@@ -0,0 +1,383 @@
+"""
+Suite de benchmarks con baseline y umbral de regresión.
+
+    poetry run python benchmarks/suite.py                 # corre y compara
+    poetry run python benchmarks/suite.py --update        # guarda el baseline
+    poetry run python benchmarks/suite.py -k add_data     # solo algunos casos
+
+Por caso se mide:
+– ops/s: unidades por segundo (frames, llamadas o requests, ver "unit")
+– p99: latencia de un paso en µs ("per": un chunk, 100 llamadas, un
+  request...)
+– blocks/op: bloques de memoria netos que quedan vivos por unidad
+  (``sys.getallocatedblocks``); CPython no lleva la cuenta total de
+  allocations, así que esto detecta crecimiento/retención por frame
+– peak KiB: pico de memoria de Python durante el caso (tracemalloc)
+
+ops/s y p99 son la mediana de ``--repeat`` (5) corridas: una corrida
+con el scheduler en contra no mueve el resultado.
+
+El baseline (``baseline.json``) es de la máquina donde se grabó: hay
+que regrabarlo con ``--update`` al cambiar de máquina. Un caso falla si
+ops/s cae más de ``--threshold`` (20 %) o el p99 sube más de
+``--p99-threshold`` (50 %) y además más de ``--p99-slack`` µs (en pasos
+de pocos µs el p99 es ruido del sistema). Un caso que falla se vuelve a
+medir una vez y solo cuenta si falla de nuevo. Sale con código 1 si
+alguno falla.
+"""
+import argparse
+import asyncio
+import fnmatch
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_parser import BMDataParser  # noqa: E402
+from src.simulator import DeviceSimulator, make_frame  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+CASES = {}
+
+
+def case(name: str, unit: str = "frames", per: str = "chunk"):
+    """
+    Registra un caso. La función arma el escenario y devuelve
+    ``(step, n_steps)``: ``step(i)`` hace un paso (``per``) y devuelve
+    cuántas unidades procesó. Puede ser ``async`` (y ``step`` también).
+    """
+    def register(fn):
+        CASES[name] = (fn, unit, per)
+        return fn
+    return register
+
+
+def sim_stream(seconds: float = 20.0, corrupt: float = 0.0) -> bytes:
+    return DeviceSimulator(corrupt_rate=corrupt, garbage_rate=corrupt, seed=1).generate(seconds)
+
+
+def counting_parser() -> BMDataParser:
+    parser = BMDataParser()
+    for name, _ in list(parser.callbacks.values()):
+        parser.register_callback(name, lambda *args: None)
+    return parser
+
+
+def chunked(stream: bytes, size: int):
+    return [stream[i:i + size] for i in range(0, len(stream), size)]
+
+
+def add_data_case(chunk_size: int, corrupt: float = 0.0):
+    def setup():
+        chunks = chunked(sim_stream(corrupt=corrupt), chunk_size)
+        parser = counting_parser()
+
+        def step(i):
+            before = parser.frames_decoded
+            parser.add_data(chunks[i])
+            return parser.frames_decoded - before
+        return step, len(chunks)
+    return setup
+
+
+case("add_data.ble_20B")(add_data_case(20))
+case("add_data.usb_256B")(add_data_case(256))
+case("resync.corrupt_5pct")(add_data_case(256, corrupt=0.05))
+
+
+def dispatch_case(packet_type: int, payload: bytes):
+    def setup():
+        parser = counting_parser()
+        frame = memoryview(make_frame(packet_type, payload))
+        parse = parser._parse_package
+
+        def step(i):
+            for _ in range(100):
+                parse(frame)
+            return 100
+        return step, 2000
+    return setup
+
+
+for _type, _payload in (
+    (0x01, b"\x80"), (0x02, b"\x00\x48\x10"), (0x03, b"\x00\x00\x78\x5d\x50"),
+    (0x04, b"\x00\x62\x48"), (0x05, b"\x00\x24\x06"), (0x30, b"\x00"),
+    (0xFE, b"\x64"), (0xFF, b"\x80"),
+):
+    case(f"dispatch.0x{_type:02X}", unit="calls", per="100 calls")(dispatch_case(_type, _payload))
+
+
+class _FakeSerial:
+    """Puerto en memoria para correr ``PM6750USBReader._loop`` sin hardware."""
+
+    def __init__(self, chunks, reader):
+        self.chunks = chunks
+        self.reader = reader
+        self.pos = 0
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[self.pos]) if self.pos < len(self.chunks) else 0
+
+    def read(self, n):
+        chunk = self.chunks[self.pos]
+        self.pos += 1
+        if self.pos >= len(self.chunks):
+            self.reader._run = False
+        return chunk
+
+
+@case("usb_loop.256B", per="pass")
+def usb_loop():
+    from src.serial_manager import PM6750USBReader
+
+    chunks = chunked(sim_stream(2.0), 256)
+    parser = counting_parser()
+
+    def step(i):
+        # una pasada completa de _loop sobre todo el stream
+        reader = PM6750USBReader(parser, port="bench", transport="thread")
+        reader.ser = _FakeSerial(chunks, reader)
+        reader._run = True
+        before = parser.frames_decoded
+        reader._loop()
+        return parser.frames_decoded - before
+    return step, 50
+
+
+@case("is_valid_data", unit="calls", per="50 calls")
+def is_valid_data():
+    try:
+        from app import DeviceSession   # necesita las dependencias de la app
+    except Exception as e:
+        raise ImportError(f"app: {e!r}") from e
+
+    parser = counting_parser()
+    for data in chunked(sim_stream(2.0), 256):
+        parser.add_data(data)
+    sessions = [SimpleNamespace(data_parser=parser), SimpleNamespace(data_parser=BMDataParser())]
+    check = DeviceSession._is_valid_data
+
+    def step(i):
+        for _ in range(50):
+            check(sessions[i & 1])
+        return 50
+    return step, 2000
+
+
+def payload_build_encode_case(encoding: str = "json"):
+    def setup():
+        from src.uploader import VitalsUploader
+        from src.waveform_codec import encode_channel
+
+        parser = counting_parser()
+        for data in chunked(sim_stream(5.0), 256):
+            parser.add_data(data)
+        uploader = VitalsUploader("http://127.0.0.1/", "token")
+        rates = parser.WAVEFORM_SAMPLE_RATES
+
+        def step(i):
+            data = parser.get_current_data()
+            if encoding != "json":
+                for name, rate in rates.items():
+                    data[name] = encode_channel(data[name], encoding, rate, 0)
+            uploader._encode({"timestamp": int(time.time() * 1000), "data": data})
+            return 1
+        return step, 3000
+    return setup
+
+
+case("payload.build_encode", unit="payloads", per="payload")(payload_build_encode_case())
+case("payload.build_encode_u8", unit="payloads", per="payload")(payload_build_encode_case("u8"))
+case("payload.build_encode_delta", unit="payloads", per="payload")(payload_build_encode_case("delta"))
+
+
+@case("payload.post_local", unit="requests", per="request")
+async def payload_post_local():
+    from aiohttp import web
+
+    from src.uploader import VitalsUploader
+
+    async def ok(request):
+        await request.read()
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/vitals", ok)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    parser = counting_parser()
+    for data in chunked(sim_stream(5.0), 256):
+        parser.add_data(data)
+    uploader = VitalsUploader(f"http://127.0.0.1:{port}/vitals", "token")
+    await uploader.start()
+
+    async def step(i):
+        if i < 0:                   # cierre
+            await uploader.close()
+            await runner.cleanup()
+            return 0
+        payload = {"timestamp": int(time.time() * 1000), "data": parser.get_current_data()}
+        if not await uploader.post(payload):
+            raise RuntimeError("local stub rejected the payload")
+        return 1
+    return step, 500
+
+
+# ---------- harness ----------------------------------------------------------
+async def _run_async(setup):
+    step, n = await setup()
+    units, latencies = 0, []
+    try:
+        start = time.perf_counter()
+        for i in range(n):
+            t0 = time.perf_counter_ns()
+            units += await step(i)
+            latencies.append(time.perf_counter_ns() - t0)
+        elapsed = time.perf_counter() - start
+    finally:
+        await step(-1)
+    return units, elapsed, latencies
+
+
+def _run_sync(setup):
+    step, n = setup()
+    units, latencies = 0, []
+    start = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter_ns()
+        units += step(i)
+        latencies.append(time.perf_counter_ns() - t0)
+    return units, time.perf_counter() - start, latencies
+
+
+def _run(setup):
+    if asyncio.iscoroutinefunction(setup):
+        return asyncio.run(_run_async(setup))
+    return _run_sync(setup)
+
+
+def measure(name: str, repeat: int = 5) -> dict:
+    setup, unit, per = CASES[name]
+    _run(setup)                         # calentamiento
+
+    # mediana de ``repeat`` corridas, para throughput y para p99
+    rates, p99s = [], []
+    for _ in range(repeat):
+        gc.collect()
+        units, elapsed, latencies = _run(setup)
+        latencies.sort()
+        rates.append(units / elapsed)
+        p99s.append(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] / 1000)
+
+    # memoria en una pasada aparte: tracemalloc frena todo
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    _run(setup)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks
+
+    return {
+        "unit": unit,
+        "per": per,
+        "ops_per_sec": round(statistics.median(rates), 1),
+        "p99_us": round(statistics.median(p99s), 2),
+        "blocks_per_op": round(blocks / max(units, 1), 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(
+    result: dict, base: dict, threshold: float, p99_threshold: float, p99_slack: float = 0.0
+) -> list:
+    problems = []
+    if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+        problems.append(
+            f"ops/s {result['ops_per_sec']:,.0f} < {base['ops_per_sec']:,.0f} -{threshold:.0%}"
+        )
+    p99_limit = max(base["p99_us"] * (1 + p99_threshold), base["p99_us"] + p99_slack)
+    if result["p99_us"] > p99_limit:
+        problems.append(f"p99 {result['p99_us']:.1f} µs > {p99_limit:.1f} µs")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("-k", dest="pattern", default="*", help="casos a correr (glob)")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update", action="store_true", help="guardar los resultados como baseline")
+    ap.add_argument("--threshold", type=float, default=0.20)
+    ap.add_argument("--p99-threshold", type=float, default=0.50)
+    ap.add_argument("--p99-slack", type=float, default=50.0, help="µs que el p99 puede subir igual")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", help="guardar los resultados en este archivo")
+    args = ap.parse_args()
+
+    names = [n for n in CASES if fnmatch.fnmatch(n, args.pattern) or args.pattern in n]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, failed = {}, []
+    print(
+        f"{'case':<24} {'ops/s':>14} {'unit':<9} {'p99 µs':>9} {'per':<10} "
+        f"{'blocks/op':>10} {'peak KiB':>9}  status"
+    )
+    for name in names:
+        try:
+            result = measure(name, args.repeat)
+        except ImportError as e:
+            print(f"{name:<24} skipped ({e})")
+            continue
+        results[name] = result
+        status = "new"
+        if name in baseline:
+            limits = (baseline[name], args.threshold, args.p99_threshold, args.p99_slack)
+            problems = compare(result, *limits)
+            if problems:
+                # se confirma con otra medición antes de darlo por regresión
+                result = measure(name, args.repeat)
+                problems = compare(result, *limits)
+                results[name] = result
+            status = "FAIL: " + "; ".join(problems) if problems else "ok"
+            if problems:
+                failed.append(name)
+        print(
+            f"{name:<24} {result['ops_per_sec']:>14,.0f} {result['unit']:<9} "
+            f"{result['p99_us']:>9.1f} {result['per']:<10} {result['blocks_per_op']:>10.3f} {result['peak_kib']:>9.1f}  {status}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if failed:
+        print(f"{len(failed)} regression(s): {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,11 +6,18 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['asyncio', 'bleak', 'pysher', 'src.data_parser', 'src.bluetooth_manager', 'aiohttp', 'aiohttp.client'],
+    # los transportes y pysher/aiohttp se importan lazy (ver app.py y src/startup.py):
+    # se listan para que entren al bundle aunque no estén en un import de primer nivel
+    hiddenimports=[
+        'asyncio', 'bleak', 'pysher', 'serial', 'aiohttp', 'aiohttp.client', 'aiohttp.web',
+        'src.data_parser', 'src.bluetooth_manager', 'src.serial_manager', 'src.capture',
+        'src.simulator', 'src.decode_pool', 'src.stream_uploader',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # lo que el monitor no usa: menos para descomprimir en cada arranque
+    excludes=['tkinter', 'unittest', 'pydoc_data', 'lib2to3', 'test'],
     noarchive=False,
     optimize=0,
 )
@@ -26,7 +33,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,  # UPX se descomprime en cada arranque: más lento
     upx_exclude=[],
     runtime_tmpdir=None,
     console=True,
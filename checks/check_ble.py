@@ -0,0 +1,254 @@
+"""
+Reconexión de BMPatientMonitor con scanner y cliente BLE falsos.
+
+    poetry run python checks/check_ble.py
+
+``scanner_cls``/``client_cls`` se reemplazan por fakes sobre un "aire"
+simulado: equipos que anuncian cada ``ADVERTISE_INTERVAL`` y que, una vez
+conectados, mandan el stream del simulador en notificaciones de 20 bytes.
+Escenarios: primer arranque (scan filtrado, corta en el primer match y
+guarda la MAC), reconexión con la MAC guardada (sin scan), MAC guardada
+que ya no responde (vuelve al scan después de ``direct_connect_timeout``
+y actualiza el cache), ``start_notify`` que falla después de conectar
+(el cliente se cierra: el equipo acepta una sola conexión), equipo que
+aparece tarde (backoff creciente, sin reusar el device del intento
+anterior), ``DEVICE_ADDRESS`` entre varios BerryMed y caída del enlace.
+Reporta el tiempo hasta el primer frame. Sale con código 1 si algo falla.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import Checks, wait_for  # noqa: E402
+from src.bluetooth_manager import BMPatientMonitor  # noqa: E402
+from src.data_parser import BMDataParser  # noqa: E402
+from src.simulator import DeviceSimulator  # noqa: E402
+
+ADVERTISE_INTERVAL = 0.05
+NOTIFY_SIZE = 20
+
+
+class FakeDevice:
+    def __init__(self, name: str, address: str, reachable: bool = True, advertising: bool = True):
+        self.name = name
+        self.address = address
+        self.reachable = reachable
+        self.advertising = advertising
+        self.notify_failures = 0    # cuántos start_notify fallan
+        self.holder = None          # como el PM-6750: una conexión a la vez
+
+
+class Air:
+    """Equipos al alcance y lo que hicieron los fakes con ellos."""
+
+    def __init__(self, *devices: FakeDevice):
+        self.devices = list(devices)
+        self.scans = 0
+        self.connects = []          # direcciones, en orden
+        self.disconnects = []
+        self.clients = []
+
+    def find(self, address: str):
+        for device in self.devices:
+            if device.address.upper() == address.upper():
+                return device
+        return None
+
+    def fakes(self):
+        air = self
+
+        class FakeScanner:
+            @classmethod
+            async def find_device_by_filter(cls, filterfunc, timeout=10.0):
+                air.scans += 1
+                deadline = time.monotonic() + timeout
+                while time.monotonic() < deadline:
+                    for device in list(air.devices):
+                        await asyncio.sleep(ADVERTISE_INTERVAL / max(len(air.devices), 1))
+                        # conectado no se anuncia
+                        if device.advertising and device.holder is None and filterfunc(device, None):
+                            return device
+                return None
+
+        class FakeClient:
+            def __init__(self, target, disconnected_callback=None):
+                self.address = getattr(target, "address", target)
+                self._disconnected_callback = disconnected_callback
+                self.is_connected = False
+                self._stream = None
+                air.clients.append(self)
+
+            async def connect(self, timeout=10.0):
+                air.connects.append(self.address)
+                device = air.find(self.address)
+                if device is None or not device.reachable or device.holder is not None:
+                    # como bleak: espera el timeout y falla
+                    await asyncio.sleep(timeout)
+                    raise asyncio.TimeoutError(f"{self.address} not reachable")
+                await asyncio.sleep(0.05)
+                self.is_connected = True
+                device.holder = self
+
+            async def start_notify(self, uuid, callback):
+                device = air.find(self.address)
+                if device.notify_failures:
+                    device.notify_failures -= 1
+                    raise OSError("start_notify failed")
+                self._stream = asyncio.ensure_future(self._notify(callback))
+
+            async def _notify(self, callback):
+                sim = DeviceSimulator(seed=1)
+                while self.is_connected:
+                    data = sim.generate(0.02)
+                    for i in range(0, len(data), NOTIFY_SIZE):
+                        callback(None, bytearray(data[i:i + NOTIFY_SIZE]))
+                    await asyncio.sleep(0.02)
+
+            async def write_gatt_char(self, uuid, data):
+                pass
+
+            async def disconnect(self):
+                air.disconnects.append(self.address)
+                self._release()
+                if self._stream:
+                    self._stream.cancel()
+
+            def drop(self):
+                """El equipo se apaga o sale de alcance."""
+                self._release()
+                if self._disconnected_callback:
+                    self._disconnected_callback(self)
+
+            def _release(self):
+                self.is_connected = False
+                device = air.find(self.address)
+                if device is not None and device.holder is self:
+                    device.holder = None
+
+        return FakeScanner, FakeClient
+
+
+def new_monitor(air: Air, cache_path: Path, **kwargs):
+    parser = BMDataParser()
+    for name, _ in list(parser.callbacks.values()):
+        parser.register_callback(name, lambda *args: None)
+    scanner_cls, client_cls = air.fakes()
+    monitor = BMPatientMonitor(
+        parser, lambda message: None, cache_path=cache_path,
+        scanner_cls=scanner_cls, client_cls=client_cls, **kwargs,
+    )
+    return monitor, parser
+
+
+async def time_to_first_frame(monitor, parser, timeout: float = 20.0):
+    """Segundos desde ``connect()`` hasta el primer frame; None si no llega."""
+    start = time.monotonic()
+    try:
+        await asyncio.wait_for(monitor.connect(), timeout)
+    except asyncio.TimeoutError:
+        return None
+    if not await wait_for(lambda: parser.frames_decoded > 0, timeout=2):
+        return None
+    return time.monotonic() - start
+
+
+def cached(cache_path: Path) -> dict:
+    import json
+
+    with open(cache_path) as f:
+        return json.load(f)
+
+
+async def run(checks: Checks) -> None:
+    tmp = Path(tempfile.mkdtemp(prefix="berrymed-ble-"))
+
+    print("first start: no cached address")
+    cache = tmp / "first.json"
+    air = Air(FakeDevice("Phone", "11:11"), FakeDevice("BerryMed-PM", "AA:01"), FakeDevice("BerryMed-PM", "AA:02"))
+    monitor, parser = new_monitor(air, cache)
+    elapsed = await time_to_first_frame(monitor, parser)
+    checks.check("connects and decodes", elapsed is not None, f"first frame after {elapsed or 0:.2f} s")
+    checks.check("one scan, stopped at the first match", air.scans == 1 and air.connects == ["AA:01"],
+                 f"connects {air.connects}")
+    checks.check("address cached", cached(cache).get("default") == "AA:01")
+    await monitor.disconnect()
+
+    print("reconnect with the cached address")
+    monitor, parser = new_monitor(air, cache)
+    air.scans = 0
+    elapsed = await time_to_first_frame(monitor, parser)
+    checks.check("direct connect, no scan", elapsed is not None and air.scans == 0,
+                 f"first frame after {elapsed or 0:.2f} s")
+    await monitor.disconnect()
+
+    print("cached address no longer answers")
+    air.find("AA:01").reachable = air.find("AA:01").advertising = False
+    monitor, parser = new_monitor(air, cache)
+    air.scans, air.connects = 0, []
+    elapsed = await time_to_first_frame(monitor, parser)
+    checks.check("falls back to the scan", elapsed is not None and air.scans == 1
+                 and air.connects == ["AA:01", "AA:02"], f"first frame after {elapsed or 0:.2f} s")
+    # timeout de la MAC guardada + scan + connect + settle_delay
+    budget = monitor.direct_connect_timeout + monitor.settle_delay + 1.0
+    checks.check("gives up on the cached address quickly", elapsed is not None and elapsed < budget,
+                 f"{elapsed or 0:.2f} s, budget {budget:.1f} s")
+    checks.check("cache updated", cached(cache).get("default") == "AA:02")
+    await monitor.disconnect()
+
+    print("start_notify fails after connecting")
+    flaky = FakeDevice("BerryMed-PM", "DD:01")
+    flaky.notify_failures = 1
+    air = Air(flaky)
+    monitor, parser = new_monitor(air, tmp / "notify.json")
+    monitor.settle_delay = 0
+    elapsed = await time_to_first_frame(monitor, parser)
+    checks.check("failed client disconnected", air.disconnects == ["DD:01"],
+                 f"disconnects {air.disconnects}")
+    checks.check("device free again, second attempt connects",
+                 elapsed is not None and air.connects == ["DD:01", "DD:01"],
+                 f"connects {air.connects}, first frame after {elapsed or 0:.2f} s")
+    await monitor.disconnect()
+
+    print("device shows up late")
+    late = FakeDevice("BerryMed-PM", "BB:01", advertising=False)
+    air = Air(late)
+    monitor, parser = new_monitor(air, tmp / "late.json")
+    monitor.scan_timeout = 0.2
+    asyncio.get_running_loop().call_later(2.0, setattr, late, "advertising", True)
+    elapsed = await time_to_first_frame(monitor, parser)
+    checks.check("retries until found", elapsed is not None and air.scans >= 3,
+                 f"{air.scans} scans, first frame after {elapsed or 0:.2f} s")
+    checks.check("no stale device reused", air.connects == ["BB:01"], f"connects {air.connects}")
+    delays = [monitor._backoff(i) for i in range(6)]
+    checks.check("backoff grows up to reconnect_interval",
+                 delays[0] < delays[2] < delays[5] <= monitor.reconnect_interval * 1.2,
+                 ", ".join(f"{d:.1f}" for d in delays))
+
+    print("link drop")
+    air.clients[-1].drop()
+    checks.check("drop clears connected", not monitor.connected)
+    await monitor.disconnect()
+
+    print("DEVICE_ADDRESS among several monitors")
+    air = Air(FakeDevice("BerryMed-PM", "CC:01"), FakeDevice("BerryMed-PM", "CC:02"))
+    monitor, parser = new_monitor(air, tmp / "address.json", address="cc:02")
+    monitor.settle_delay = 0
+    elapsed = await time_to_first_frame(monitor, parser)
+    checks.check("connects only to DEVICE_ADDRESS", elapsed is not None and set(air.connects) == {"cc:02"},
+                 f"connects {air.connects}")
+    await monitor.disconnect()
+
+
+def main():
+    checks = Checks()
+    asyncio.run(run(checks))
+    return checks.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
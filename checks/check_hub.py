@@ -0,0 +1,157 @@
+"""
+Modo hub: muchos equipos simulados en un proceso contra una API local.
+
+    poetry run python checks/check_hub.py [--devices 24] [--seconds 3]
+
+Con ``--devices`` equipos ``DEVICE_CONNECTION: "sim"`` en un mismo
+VitalsMonitor: cada uno tiene su parser y su conexión, el uploader y el
+outbox son compartidos, todos decodifican, un START con ``totemId`` solo
+hace enviar a ese equipo, un START sin ``totemId`` a todos, y un STOP con
+``totemId`` frena solo a ese. Pusher se reemplaza por un cliente sin red.
+Corre con HOME en un directorio temporal (credentials.json y outbox).
+Sale con código 1 si algo falla.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# antes de importar la app: el outbox va a get_app_data_path()
+_home = tempfile.mkdtemp(prefix="berrymed-check-")
+os.environ["HOME"] = os.environ["APPDATA"] = _home
+
+from aiohttp import web  # noqa: E402
+
+from common import Checks, wait_for  # noqa: E402
+
+
+class OfflinePusher:
+    """Lo que usa ``_pusher_service`` de pysher.Pusher, sin conectarse."""
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+async def serve_api(received: list):
+    async def post(request):
+        received.append((time.monotonic(), await request.json()))
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/vitals", post)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner, runner.addresses[0][1]
+
+
+def totems_since(received: list, since: float) -> set:
+    return {payload.get("totemId") for t, payload in received if t >= since}
+
+
+async def check_hub(checks: Checks, devices: int, seconds: float) -> None:
+    import app
+    from config import ConfigStore
+
+    received = []
+    runner, port = await serve_api(received)
+    path = os.path.join(_home, "credentials.json")
+    ids = [f"bed-{i}" for i in range(devices)]
+    with open(path, "w") as f:
+        json.dump({
+            "API_URL": f"http://127.0.0.1:{port}/vitals",
+            "API_USERNAME": "check",
+            "API_PASSWORD": "check",
+            "PUBLIC_CHANNEL": "check",
+            "PUSHER_KEY": "check",
+            "PUSHER_CLUSTER": "check",
+            "START_EVENT_NAME": "start",
+            "STOP_EVENT_NAME": "stop",
+            "CONFIG_POLL_INTERVAL": 0,
+            "DEVICES": [
+                {"TOTEM_ID": totem, "DEVICE_CONNECTION": "sim", "SIM_OPTIONS": {"seed": i}}
+                for i, totem in enumerate(ids)
+            ],
+        }, f)
+    store = ConfigStore(path)
+    store.load()
+
+    vm = app.VitalsMonitor(store)
+    vm.pusher_subscriber = OfflinePusher()
+    task = asyncio.create_task(vm.run())
+    try:
+        sessions = list(vm.devices.values())
+        checks.check("one session per device", sorted(vm.devices) == sorted(ids), f"{len(vm.devices)}")
+        checks.check(
+            "own parser and connection",
+            len({id(s.data_parser) for s in sessions}) == devices
+            and len({id(s.monitor) for s in sessions}) == devices,
+        )
+        checks.check("shared uploader", all(s.uploader is vm.uplink for s in sessions))
+
+        decoding = await wait_for(
+            lambda: all(s.data_parser.frames_decoded for s in sessions), timeout=seconds
+        )
+        checks.check(
+            "every device decodes", decoding,
+            f"{sum(1 for s in sessions if s.data_parser.frames_decoded)}/{devices}",
+        )
+
+        # START con totemId: solo ese equipo
+        since = time.monotonic()
+        vm.handle_start_event(json.dumps({"totemId": ids[0]}))
+        await asyncio.sleep(seconds / 2)
+        checks.check(
+            "START routed by totemId", totems_since(received, since) == {ids[0]},
+            f"payloads from {sorted(totems_since(received, since))[:5]}",
+        )
+
+        # START sin totemId: todos
+        vm.handle_start_event("{}")
+        since = time.monotonic()
+        everyone = await wait_for(lambda: totems_since(received, since) == set(ids), timeout=seconds)
+        checks.check(
+            "START without totemId reaches all", everyone,
+            f"{len(totems_since(received, since))}/{devices} totems",
+        )
+
+        # STOP con totemId: solo ese deja de enviar
+        vm.handle_stop_event(json.dumps({"totemId": ids[0]}))
+        await asyncio.sleep(0.1)            # payloads ya en vuelo
+        since = time.monotonic()
+        await asyncio.sleep(seconds / 2)
+        active = totems_since(received, since)
+        checks.check(
+            "STOP routed by totemId", ids[0] not in active and len(active) == devices - 1,
+            f"{len(active)} totems still sending",
+        )
+        checks.check("unknown totemId is ignored", vm._route(json.dumps({"totemId": "nope"})) == [])
+        checks.check("nothing went to the outbox", len(vm.outbox) == 0, f"{len(vm.outbox)} queued")
+    finally:
+        vm.runtime.stop()
+        await task
+        await runner.cleanup()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--devices", type=int, default=24)
+    ap.add_argument("--seconds", type=float, default=3.0, help="espera máxima por paso")
+    args = ap.parse_args()
+
+    checks = Checks()
+    print(f"hub with {args.devices} simulated devices")
+    asyncio.run(check_hub(checks, args.devices, args.seconds))
+    return checks.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
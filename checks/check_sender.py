@@ -0,0 +1,126 @@
+"""
+Cadencia del envío de DeviceSession: ondas a ritmo de FLUSH_INTERVAL y
+lo urgente enseguida.
+
+    poetry run python checks/check_sender.py [--flush-interval 5]
+
+Con el envío habilitado (START) se alimenta el parser a mano y un uploader
+falso anota cuándo llega cada payload. Por cada modo (``full``/``display``
+y ``delta``/``numeric``): el primer payload no trae las ondas de antes
+del START, ondas y parámetros sin cambios esperan al próximo flush, un
+cambio del byte de estado (alarma, cable suelto) y un resultado de NIBP
+despiertan al sender antes de FLUSH_INTERVAL, y en ``numeric`` el estado
+nuevo viaja en el payload. Sale con código 1 si algo falla.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import Checks, wait_for  # noqa: E402
+from src.simulator import make_frame  # noqa: E402
+
+WAKE_LIMIT = 0.5            # segundos: bastante menos que FLUSH_INTERVAL
+
+
+class RecordingUploader:
+    """La interfaz de VitalsUploader.submit, sin red: guarda (hora, payload)."""
+
+    def __init__(self):
+        self.sent = []
+
+    def submit(self, payload, on_success=None, on_spooled=None) -> bool:
+        self.sent.append((time.monotonic(), payload))
+        if on_success is not None:
+            on_success()
+        return True
+
+
+def waves(n: int = 25) -> bytes:
+    return b"".join(make_frame(t, b"\x80") for _ in range(n) for t in (0x01, 0xFE, 0xFF))
+
+
+async def time_to_send(uploader: RecordingUploader, data: bytes, parser, limit: float):
+    """Segundos desde ``add_data`` hasta el próximo payload; None si pasa ``limit``."""
+    count = len(uploader.sent)
+    start = time.monotonic()
+    parser.add_data(data)
+    if not await wait_for(lambda: len(uploader.sent) > count, timeout=limit):
+        return None
+    return uploader.sent[-1][0] - start
+
+
+async def check_mode(checks: Checks, upload_mode: str, vitals_format: str, flush_interval: float):
+    import app
+    from config import Config, DeviceConfig
+
+    print(f"upload_mode={upload_mode} vitals_format={vitals_format}")
+    cfg = Config(
+        api_url="http://127.0.0.1/vitals", key="check", cluster="check",
+        flush_interval=flush_interval, upload_mode=upload_mode, vitals_format=vitals_format,
+    )
+    uploader = RecordingUploader()
+    session = app.DeviceSession(DeviceConfig("bed-1", connection="sim"), cfg, uploader)
+    parser = session.data_parser
+    session.bind(asyncio.get_running_loop())
+    sender = asyncio.create_task(session.send_data())
+    try:
+        await asyncio.sleep(0.05)           # el sender espera el START, como en la app
+        parser.add_data(waves(200))         # ondas de antes del START: no se envían
+        await session._execute(app.commands.Command(app.commands.START))
+        await asyncio.sleep(0.05)           # y arranca su intervalo
+
+        # primer paquete de cada tipo: fija el estado inicial, no es urgente
+        first = make_frame(0x02, bytes([0, 72, 16])) + make_frame(0x04, bytes([0, 98, 72]))
+        elapsed = await time_to_send(uploader, first + waves(), parser, WAKE_LIMIT)
+        checks.check("routine data waits for FLUSH_INTERVAL", elapsed is None,
+                     f"sent after {elapsed:.2f} s" if elapsed else "")
+        flushed = await wait_for(lambda: uploader.sent, timeout=flush_interval)
+        checks.check("routine data sent at FLUSH_INTERVAL", flushed)
+        if flushed:
+            ecg = uploader.sent[0][1]["data"]["ecg"]
+            checks.check("first payload starts at START", len(ecg) == 25,
+                         f"{len(ecg)} ECG samples, 25 after START")
+
+        alarm = make_frame(0x02, bytes([0x01, 72, 16]))
+        elapsed = await time_to_send(uploader, alarm, parser, WAKE_LIMIT)
+        checks.check("status change wakes the sender", elapsed is not None,
+                     f"after {elapsed or 0:.3f} s, FLUSH_INTERVAL {flush_interval:g} s")
+        if vitals_format == "numeric" and elapsed is not None:
+            status = uploader.sent[-1][1]["data"]["vitals"]["status"]
+            checks.check("new status in the payload", status.get("ecg") == 0x01, f"{status}")
+
+        probe = make_frame(0x04, bytes([0x01, 98, 72]))
+        elapsed = await time_to_send(uploader, probe, parser, WAKE_LIMIT)
+        checks.check("SpO2 status change wakes the sender", elapsed is not None,
+                     f"after {elapsed or 0:.3f} s")
+
+        elapsed = await time_to_send(
+            uploader, make_frame(0x03, bytes([0, 0, 120, 93, 80])), parser, WAKE_LIMIT
+        )
+        checks.check("NIBP result wakes the sender", elapsed is not None, f"after {elapsed or 0:.3f} s")
+
+        elapsed = await time_to_send(uploader, alarm + waves(), parser, WAKE_LIMIT)
+        checks.check("unchanged status does not", elapsed is None,
+                     f"sent after {elapsed:.2f} s" if elapsed else "")
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--flush-interval", type=float, default=5.0)
+    args = ap.parse_args()
+
+    checks = Checks()
+    for upload_mode, vitals_format in (("full", "display"), ("delta", "numeric")):
+        asyncio.run(check_mode(checks, upload_mode, vitals_format, args.flush_interval))
+    return checks.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
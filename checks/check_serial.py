@@ -0,0 +1,99 @@
+"""
+PM6750USBReader contra un par pty en lugar del equipo.
+
+    poetry run python checks/check_serial.py [--transport asyncio,thread]
+
+Por cada transporte: ``connect`` habilita los streams (los comandos llegan
+al otro lado del pty), el stream del simulador se decodifica completo y
+sin errores de checksum, y un cuelgue del pty (cable desenchufado) deja
+``connected`` en False. Con ``asyncio`` además: el parser se alimenta en
+el hilo del loop, con lecturas grandes (menos lecturas que frames), y
+``disconnect`` saca el reader del loop. Sale con código 1 si algo falla.
+"""
+import argparse
+import asyncio
+import os
+import pty
+import select
+import sys
+import threading
+import tty
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import Checks, wait_for  # noqa: E402
+from src.data_parser import BMDataParser  # noqa: E402
+from src.serial_manager import HEADER, PM6750USBReader  # noqa: E402
+from src.simulator import DeviceSimulator  # noqa: E402
+
+STREAM_COMMANDS = 6         # ECG/NIBP/SpO2/TEMP + ondas ECG/SpO2/RESP
+
+
+def read_commands(fd: int, timeout: float = 1.0) -> bytes:
+    out = b""
+    while select.select([fd], [], [], timeout)[0]:
+        out += os.read(fd, 4096)
+        timeout = 0.1
+    return out
+
+
+async def check_transport(checks: Checks, transport: str, seconds: float) -> None:
+    print(f"transport={transport}")
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    port = os.ttyname(slave)
+
+    parser = BMDataParser()
+    threads = set()
+    for name, _ in list(parser.callbacks.values()):
+        parser.register_callback(name, lambda *args: threads.add(threading.get_ident()))
+    reader = PM6750USBReader(parser, port=port, transport=transport)
+
+    checks.check("connect", await reader.connect())
+    os.close(slave)                 # el puerto queda abierto solo por pyserial
+    commands = await asyncio.to_thread(read_commands, master)
+    sent = commands.count(HEADER)
+    checks.check("stream commands sent", sent == STREAM_COMMANDS, f"{sent} frames")
+
+    sim = DeviceSimulator(seed=1)
+    stream = sim.generate(seconds)
+    for i in range(0, len(stream), 512):
+        os.write(master, stream[i:i + 512])
+        await asyncio.sleep(0.002)
+    decoded = await wait_for(lambda: parser.frames_decoded >= sim.frames, timeout=5)
+    checks.check(
+        "all frames decoded", decoded and parser.checksum_failures == 0,
+        f"{parser.frames_decoded}/{sim.frames}, {parser.checksum_failures} bad checksums",
+    )
+    checks.check("last_data_timestamp set", reader.last_data_timestamp > 0)
+    if transport == "asyncio":
+        checks.check(
+            "parser fed on the loop thread", threads == {threading.get_ident()},
+            f"{len(threads)} thread(s)",
+        )
+        checks.check(
+            "large reads", reader.chunks_received < sim.frames,
+            f"{reader.chunks_received} reads for {sim.frames} frames",
+        )
+
+    os.close(master)                # cuelgue: el otro lado desaparece
+    checks.check("hangup detected", await wait_for(lambda: not reader.connected, timeout=2))
+    await reader.disconnect()
+    if transport == "asyncio":
+        checks.check("reader removed from the loop", reader._aio_loop is None)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--transport", default="asyncio,thread")
+    ap.add_argument("--seconds", type=float, default=2.0, help="segundos de stream simulado")
+    args = ap.parse_args()
+
+    checks = Checks()
+    for transport in args.transport.split(","):
+        asyncio.run(check_transport(checks, transport, args.seconds))
+    return checks.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
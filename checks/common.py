@@ -0,0 +1,39 @@
+"""Helpers compartidos por los scripts de checks/."""
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class Checks:
+    """Junta los resultados: cada ``check`` imprime una línea y ``exit_code`` resume."""
+
+    def __init__(self):
+        self.failed = []
+
+    def check(self, name: str, ok: bool, detail: str = "") -> bool:
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}" + (f" ({detail})" if detail else ""))
+        if not ok:
+            self.failed.append(name)
+        return ok
+
+    def exit_code(self) -> int:
+        if self.failed:
+            print(f"{len(self.failed)} check(s) failed: {', '.join(self.failed)}")
+            return 1
+        print("all checks passed")
+        return 0
+
+
+async def wait_for(predicate, timeout: float, interval: float = 0.01) -> bool:
+    """Espera hasta que ``predicate()`` sea verdadero; False si vence ``timeout``."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
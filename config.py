@@ -1,7 +1,26 @@
+import asyncio
+import inspect
 import json
+import logging
 import os
 import sys
+from dataclasses import dataclass, field, fields
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+DEVICE_CONNECTIONS = ("bt", "usb", "replay", "sim")
+DEVICE_TRANSPORTS = ("auto", "asyncio", "thread")
+UPLOAD_MODES = ("full", "delta")
+WAVEFORM_ENCODINGS = ("json", "u8", "delta")
+UPLINKS = ("post", "websocket")
+VITALS_FORMATS = ("display", "numeric")
+CAPTURE_COMPRESSIONS = ("gzip", "zstd", None)
+
+
+class ConfigError(ValueError):
+    """``credentials.json`` con un valor inválido (clave y motivo en el mensaje)."""
 
 
 def get_app_data_path() -> Path:
@@ -15,38 +34,312 @@ def get_app_data_path() -> Path:
         return Path.home() / ".berrymed"
 
 
-def get_config():
-    """Read and return the credentials from the JSON file"""
+def _number(raw: dict, key: str, default, kind=float, minimum=0):
+    value = raw.get(key, default)
+    try:
+        value = kind(value)
+    except (TypeError, ValueError):
+        raise ConfigError(f"{key}: expected a number, got {value!r}") from None
+    if value < minimum:
+        raise ConfigError(f"{key}: must be >= {minimum}, got {value}")
+    return value
+
+
+def _choice(raw: dict, key: str, default, choices):
+    value = raw.get(key, default)
+    if isinstance(value, str):
+        value = value.lower() or None
+    if value not in choices:
+        raise ConfigError(f"{key}: expected one of {choices}, got {value!r}")
+    return value
+
+
+def _bool(raw: dict, key: str, default: bool) -> bool:
+    value = raw.get(key, default)
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    if not isinstance(value, bool):
+        raise ConfigError(f"{key}: expected true or false, got {value!r}")
+    return value
+
+
+def _packet_type(key, where: str) -> int:
+    # las claves de un objeto JSON son strings: "1", "0x01"
     try:
-        config_dir = get_app_data_path()
-        config_file = config_dir / "credentials.json"
-
-        if not config_file.exists():
-            print(f"Credentials file not found at: {config_file}")
-            return None
-
-        with open(config_file, "r") as f:
-            credentials = json.load(f)
-
-        # Return all configurations from credentials file
-        return {
-            "key": credentials.get("PUSHER_KEY"),
-            "cluster": credentials.get("PUSHER_CLUSTER"),
-            "TOTEM_ID": credentials.get("TOTEM_ID"),
-            "api_url": credentials.get("API_URL"),
-            "api_username": credentials.get("API_USERNAME"),
-            "api_password": credentials.get("API_PASSWORD"),
-            "public_channel": credentials.get("PUBLIC_CHANNEL"),
-            "start_event_name": credentials.get("START_EVENT_NAME"),
-            "stop_event_name": credentials.get("STOP_EVENT_NAME"),
-            "device_connection": credentials.get("DEVICE_CONNECTION", "bt"),
-            "device_port": credentials.get("DEVICE_PORT", "COM3"),
-            "ssl_cert_file": credentials.get("SSL_CERT_FILE_PATH")
-        }
-
-    except Exception as e:
-        print(f"Error reading credentials: {e}")
-        return None
-
-
-PUSHER_CONFIG = get_config()
+        return int(key, 16) if key.lower().startswith("0x") else int(key)
+    except (AttributeError, ValueError):
+        raise ConfigError(f"{where}: expected a packet type, got {key!r}") from None
+
+
+def _sim_options(sim_options: dict, totem_id) -> dict:
+    """
+    ``SIM_OPTIONS`` contra la firma de ``DeviceSimulator``: claves
+    conocidas, tipos, y ``rates`` con claves de tipo de paquete como int.
+    """
+    # import diferido: config se carga en todos los modos, el simulador no
+    from src.simulator import DEFAULT_RATES, DeviceSimulator
+
+    params = inspect.signature(DeviceSimulator).parameters
+    options = {}
+    for key, value in sim_options.items():
+        where = f"SIM_OPTIONS.{key} ({totem_id})"
+        if key not in params:
+            raise ConfigError(
+                f"SIM_OPTIONS ({totem_id}): unknown option {key!r}, expected one of {sorted(params)}"
+            )
+        if key == "rates":
+            if not isinstance(value, dict):
+                raise ConfigError(f"{where}: expected an object")
+            value = {_packet_type(k, where): _number({where: v}, where, None) for k, v in value.items()}
+            unknown = sorted(set(value) - set(DEFAULT_RATES))
+            if unknown:
+                raise ConfigError(f"{where}: unknown packet types {[hex(t) for t in unknown]}")
+        elif key == "seed":
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+                raise ConfigError(f"{where}: expected an integer, got {value!r}")
+        elif key == "nibp_result":
+            if not isinstance(value, (list, tuple)) or len(value) != 3:
+                raise ConfigError(f"{where}: expected [systolic, mean, diastolic], got {value!r}")
+            value = tuple(_number({where: v}, where, None, int) for v in value)
+        else:
+            value = _number({where: value}, where, None, type(params[key].default))
+        options[key] = value
+    return options
+
+
+@dataclass(frozen=True)
+class DeviceConfig:
+    """Un equipo de ``DEVICES`` (o el único, con las claves de siempre)."""
+
+    totem_id: Optional[str]
+    connection: str = "bt"
+    port: Optional[str] = "COM3"
+    transport: str = "auto"
+    address: Optional[str] = None
+    sim_options: Dict = field(default_factory=dict)
+
+    @classmethod
+    def from_entry(cls, entry: dict, credentials: dict) -> "DeviceConfig":
+        totem_id = entry.get("TOTEM_ID", credentials.get("TOTEM_ID"))
+        sim_options = entry.get("SIM_OPTIONS") or {}
+        if not isinstance(sim_options, dict):
+            raise ConfigError(f"SIM_OPTIONS ({totem_id}): expected an object")
+        if sim_options:
+            sim_options = _sim_options(sim_options, totem_id)
+        return cls(
+            totem_id=None if totem_id is None else str(totem_id),
+            connection=_choice(entry, "DEVICE_CONNECTION", "bt", DEVICE_CONNECTIONS),
+            port=entry.get("DEVICE_PORT", "COM3"),
+            transport=_choice(entry, "DEVICE_TRANSPORT", "auto", DEVICE_TRANSPORTS),
+            address=entry.get("DEVICE_ADDRESS"),
+            sim_options=sim_options,
+        )
+
+
+def _get_devices(credentials: dict) -> Tuple[DeviceConfig, ...]:
+    """
+    Lista de equipos a atender. Sin ``DEVICES`` en el archivo se arma un
+    único equipo con las claves de siempre (TOTEM_ID, DEVICE_*).
+    """
+    entries = credentials.get("DEVICES") or [credentials]
+    if not isinstance(entries, list):
+        raise ConfigError("DEVICES: expected a list")
+    devices = tuple(DeviceConfig.from_entry(entry, credentials) for entry in entries)
+    ids = [device.totem_id for device in devices]
+    if len(set(ids)) != len(ids):
+        raise ConfigError(f"DEVICES: duplicated TOTEM_ID in {ids}")
+    return devices
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    ``credentials.json`` validado. Inmutable: una recarga arma otro
+    ``Config`` y ``ConfigStore`` avisa qué campos cambiaron.
+    """
+
+    api_url: str
+    key: str
+    cluster: str
+    api_username: Optional[str] = None
+    api_password: Optional[str] = field(default=None, repr=False)
+    TOTEM_ID: Optional[str] = None
+    public_channel: Optional[str] = None
+    start_event_name: Optional[str] = None
+    stop_event_name: Optional[str] = None
+    ssl_cert_file: Optional[str] = None
+    decode_workers: int = 0
+    flush_interval: float = 1.0
+    stall_timeout: float = 5.0
+    upload_mode: str = "full"
+    waveform_encoding: str = "json"
+    vitals_format: str = "display"
+    keyframe_interval: float = 30.0
+    upload_max_in_flight: int = 4
+    upload_gzip: bool = False
+    uplink: str = "post"
+    stream_url: Optional[str] = None
+    stream_max_pending: int = 512
+    stream_heartbeat: float = 10.0
+    api_bulk_url: Optional[str] = None
+    outbox_max_items: int = 20000
+    outbox_max_age: float = 24 * 3600
+    capture_dir: Optional[str] = None
+    capture_compression: Optional[str] = "gzip"
+    replay_speed: float = 1.0
+    metrics_port: int = 0
+    log_level: str = "INFO"
+    log_rate_limit: float = 10.0
+    config_poll_interval: float = 2.0
+    devices: Tuple[DeviceConfig, ...] = ()
+
+    @classmethod
+    def from_credentials(cls, credentials: dict) -> "Config":
+        if not isinstance(credentials, dict):
+            raise ConfigError("expected a JSON object")
+        for key in ("API_URL", "PUSHER_KEY", "PUSHER_CLUSTER"):
+            if not credentials.get(key):
+                raise ConfigError(f"{key}: missing")
+        log_level = str(credentials.get("LOG_LEVEL", "INFO")).upper()
+        if not isinstance(logging.getLevelName(log_level), int):
+            raise ConfigError(f"LOG_LEVEL: unknown level {log_level!r}")
+
+        uplink = _choice(credentials, "UPLINK", "post", UPLINKS)
+        if uplink == "websocket" and not credentials.get("STREAM_URL"):
+            raise ConfigError("STREAM_URL: required with UPLINK \"websocket\"")
+
+        return cls(
+            api_url=credentials["API_URL"],
+            key=credentials["PUSHER_KEY"],
+            cluster=credentials["PUSHER_CLUSTER"],
+            api_username=credentials.get("API_USERNAME"),
+            api_password=credentials.get("API_PASSWORD"),
+            TOTEM_ID=credentials.get("TOTEM_ID"),
+            public_channel=credentials.get("PUBLIC_CHANNEL"),
+            start_event_name=credentials.get("START_EVENT_NAME"),
+            stop_event_name=credentials.get("STOP_EVENT_NAME"),
+            ssl_cert_file=credentials.get("SSL_CERT_FILE_PATH"),
+            decode_workers=_number(credentials, "DECODE_WORKERS", 0, int),
+            flush_interval=_number(credentials, "FLUSH_INTERVAL", 1.0, minimum=0.01),
+            stall_timeout=_number(credentials, "STALL_TIMEOUT", 5.0, minimum=0.1),
+            upload_mode=_choice(credentials, "UPLOAD_MODE", "full", UPLOAD_MODES),
+            waveform_encoding=_choice(
+                credentials, "WAVEFORM_ENCODING", "json", WAVEFORM_ENCODINGS
+            ),
+            vitals_format=_choice(credentials, "VITALS_FORMAT", "display", VITALS_FORMATS),
+            keyframe_interval=_number(credentials, "KEYFRAME_INTERVAL", 30),
+            upload_max_in_flight=_number(credentials, "UPLOAD_MAX_IN_FLIGHT", 4, int, minimum=1),
+            upload_gzip=_bool(credentials, "UPLOAD_GZIP", False),
+            uplink=uplink,
+            stream_url=credentials.get("STREAM_URL"),
+            stream_max_pending=_number(credentials, "STREAM_MAX_PENDING", 512, int, minimum=1),
+            stream_heartbeat=_number(credentials, "STREAM_HEARTBEAT", 10.0, minimum=1),
+            api_bulk_url=credentials.get("API_BULK_URL"),
+            outbox_max_items=_number(credentials, "OUTBOX_MAX_ITEMS", 20000, int, minimum=1),
+            outbox_max_age=_number(credentials, "OUTBOX_MAX_AGE", 24 * 3600),
+            capture_dir=credentials.get("CAPTURE_DIR"),
+            capture_compression=_choice(
+                credentials, "CAPTURE_COMPRESSION", "gzip", CAPTURE_COMPRESSIONS
+            ),
+            replay_speed=_number(credentials, "REPLAY_SPEED", 1.0),
+            metrics_port=_number(credentials, "METRICS_PORT", 0, int),
+            log_level=log_level,
+            log_rate_limit=_number(credentials, "LOG_RATE_LIMIT", 10),
+            config_poll_interval=_number(credentials, "CONFIG_POLL_INTERVAL", 2.0),
+            devices=_get_devices(credentials),
+        )
+
+    def changed(self, other: "Config") -> List[str]:
+        """Campos con distinto valor en ``other``."""
+        return [f.name for f in fields(self) if getattr(self, f.name) != getattr(other, f.name)]
+
+
+class ConfigStore:
+    """
+    Lee ``credentials.json`` una vez y lo guarda. ``check()`` compara el
+    mtime/tamaño del archivo y, si cambió, lo vuelve a leer y llama a los
+    suscriptores con ``(viejo, nuevo)``. Un archivo inválido (a medio
+    escribir, un valor mal puesto) se informa y se sigue con el anterior.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else get_app_data_path() / "credentials.json"
+        self.config: Optional[Config] = None
+        self.reloads = 0
+        self._stamp = None
+        self._subscribers: List[Callable[[Config, Config], None]] = []
+
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self) -> Config:
+        with open(self.path, "r") as f:
+            return Config.from_credentials(json.load(f))
+
+    def load(self) -> Optional[Config]:
+        """Carga inicial; ``None`` si no hay archivo o no es válido."""
+        try:
+            self._stamp = self._file_stamp()
+            self.config = self._read()
+        except FileNotFoundError:
+            log.warning("[CONFIG] Credentials file not found at: %s", self.path)
+        except Exception as e:
+            log.error("[CONFIG] Error reading credentials: %s", e)
+        return self.config
+
+    def subscribe(self, callback: Callable[[Config, Config], None]) -> None:
+        self._subscribers.append(callback)
+
+    def check(self) -> bool:
+        """Recarga si el archivo cambió; True si hay un ``Config`` nuevo."""
+        try:
+            stamp = self._file_stamp()
+        except OSError:
+            return False            # borrado o renombrado a mitad de un guardado
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            new = self._read()
+        except Exception as e:
+            log.warning("[CONFIG] %s not reloaded, keeping the previous config: %s", self.path, e)
+            return False
+
+        old, self.config = self.config, new
+        self.reloads += 1
+        if old is None:
+            return True
+        changed = old.changed(new)
+        if not changed:
+            return False
+        log.info("[CONFIG] Reloaded %s: %s", self.path.name, ", ".join(changed))
+        for callback in self._subscribers:
+            try:
+                callback(old, new)
+            except Exception as e:
+                log.error("[CONFIG] Error applying the new config: %s", e)
+        return True
+
+    async def watch(self, interval: float = 2.0):
+        """Servicio del runtime: polling del mtime cada ``interval`` s."""
+        while True:
+            await asyncio.sleep(interval)
+            self.check()
+
+
+_store: Optional[ConfigStore] = None
+
+
+def get_store() -> ConfigStore:
+    """El ``ConfigStore`` del proceso (se crea y carga la primera vez)."""
+    global _store
+    if _store is None:
+        _store = ConfigStore()
+        _store.load()
+    return _store
+
+
+def get_config() -> Optional[Config]:
+    """Config actual del proceso, leída una sola vez; ``None`` si no hay."""
+    return get_store().config
@@ -1,13 +1,36 @@
 import asyncio
+import json
+import logging
+import random
+import time
+from pathlib import Path
 from typing import Callable, Optional
 
 from bleak import BleakClient, BleakScanner
 
+log = logging.getLogger(__name__)
+
 
 class BMPatientMonitor:
-    def __init__(self, data_parser, status_callback: Callable):
+    def __init__(
+        self,
+        data_parser,
+        status_callback: Callable,
+        address: Optional[str] = None,
+        cache_path: Optional[Path] = None,
+        cache_key: str = "default",
+        scanner_cls=BleakScanner,
+        client_cls=BleakClient,
+    ):
         self.data_parser = data_parser
         self.status_callback = status_callback
+        self.address = address  # con varios equipos: conectar solo a esta MAC
+        # última MAC conocida, para reconectar sin escanear
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.cache_key = cache_key
+        # inyectables para tests / dispositivos simulados
+        self.scanner_cls = scanner_cls
+        self.client_cls = client_cls
         self.client: Optional[BleakClient] = None
         self.device = None
         self.connected = False
@@ -18,54 +41,75 @@ class BMPatientMonitor:
         self.CHAR_RECEIVE_UUID = "49535343-1e4d-4bd9-ba61-23c647249616"
         self.CHAR_SEND_UUID = "49535343-8841-43f4-a8d4-ecbe34729bb3"
 
-        self.reconnect_interval = 5  # seconds between reconnection attempts
+        self.reconnect_interval = 5  # máximo entre reintentos (seconds)
+        self.min_reconnect_interval = 0.5
+        self.scan_timeout = 5.0      # el scan corta en el primer match
+        self.connect_timeout = 10.0  # device recién encontrado por el scan
+        self.direct_connect_timeout = 3.0  # MAC guardada: si no contesta, al scan
+        self.settle_delay = 1.0      # espera entre connect y start_notify
         self.is_device_active = False
         self.last_data_timestamp = 0
+        self.chunks_received = 0            # notificaciones (métricas)
+        self.bytes_received = 0
+        self.capture = None                 # CaptureWriter opcional (src.capture)
 
     async def connect(self) -> bool:
+        attempt = 0
         while True:
+            # nunca reusar un device de un intento anterior
+            self.device = None
+            self.client = None
             try:
-                self.status_callback("Scanning for BerryMed device...")
-
-                devices = await BleakScanner.discover()
-                for device in devices:
-                    if device.name and self.DEVICE_NAME in device.name:
-                        self.device = device
-                        break
-
-                if not self.device:
-                    self.status_callback(
-                        "BerryMed device not found, retrying in 5 seconds..."
+                target = self.address or self._load_cached_address()
+                if target and await self._open_client(target, self.direct_connect_timeout):
+                    self.status_callback(f"Reconnected to {target}")
+                else:
+                    self.status_callback("Scanning for BerryMed device...")
+                    self.device = await self.scanner_cls.find_device_by_filter(
+                        self._match_device, timeout=self.scan_timeout
                     )
-                    await asyncio.sleep(self.reconnect_interval)
-                    continue
-
-                self.status_callback(f"Connecting to {self.device.name}...")
-                self.client = BleakClient(self.device)
-                await self.client.connect()
-                self.connected = True
-
-                await asyncio.sleep(1)
-
+                    if not self.device:
+                        raise LookupError("BerryMed device not found")
+                    self.status_callback(f"Connecting to {self.device.name}...")
+                    if not await self._open_client(self.device, self.connect_timeout):
+                        raise ConnectionError(f"could not connect to {self.device.address}")
+
+                if self.settle_delay:
+                    await asyncio.sleep(self.settle_delay)
                 await self.client.start_notify(
                     self.CHAR_RECEIVE_UUID, self._handle_data
                 )
+                self._save_cached_address(self.client.address)
 
                 self.status_callback("Connected to BerryMed")
                 return True
 
             except Exception as e:
+                self.connected = False
+                # el equipo acepta una sola conexión y deja de anunciarse:
+                # un cliente abierto que no quedó en uso hay que cerrarlo
+                client, self.client = self.client, None
+                if client is not None:
+                    try:
+                        await client.disconnect()
+                    except Exception as close_error:
+                        log.warning("[BLE] Error disconnecting: %s", close_error)
+                delay = self._backoff(attempt)
+                attempt += 1
                 self.status_callback(
-                    f"Connection error: {str(e)}, retrying in 5 seconds..."
+                    f"Connection error: {str(e)}, retrying in {delay:.1f} seconds..."
                 )
-                self.connected = False
-                await asyncio.sleep(self.reconnect_interval)
+                await asyncio.sleep(delay)
 
     async def disconnect(self):
+        self.connected = False
         if self.client and self.client.is_connected:
-            await self.client.disconnect()
-            self.connected = False
+            try:
+                await self.client.disconnect()
+            except Exception as e:
+                log.warning("[BLE] Error disconnecting: %s", e)
             self.status_callback("Disconnected")
+        self.client = None
 
     async def start_nibp(self):
         if self.client and self.client.is_connected:
@@ -74,23 +118,66 @@ class BMPatientMonitor:
 
     def _handle_data(self, _, data: bytearray):
         # Update last data timestamp
-        self.last_data_timestamp = asyncio.get_event_loop().time()
+        self.last_data_timestamp = time.monotonic()
         self.is_device_active = True
+        self.chunks_received += 1
+        self.bytes_received += len(data)
+        if self.capture is not None:
+            self.capture.write(data)
         self.data_parser.add_data(data)
 
-    async def check_connection(self):
-        """Check if device is still connected and sending valid data"""
-        current_time = asyncio.get_event_loop().time()
-        if self.connected and (current_time - self.last_data_timestamp) > 5:
+    # ---------- reconexión rápida ---------------------------------------------
+    def _match_device(self, device, advertisement_data=None) -> bool:
+        if self.address:
+            return device.address.upper() == self.address.upper()
+        return bool(device.name and self.DEVICE_NAME in device.name)
+
+    async def _open_client(self, target, timeout: float) -> bool:
+        client = self.client_cls(target, disconnected_callback=self._on_disconnected)
+        try:
+            await client.connect(timeout=timeout)
+        except Exception as e:
+            log.warning("[BLE] Connect to %s failed: %s", getattr(target, "address", target), e)
+            return False
+        self.client = client
+        self.connected = True
+        return True
+
+    def _on_disconnected(self, client) -> None:
+        # lo llama bleak cuando se cae el enlace; el supervisor reconecta
+        if client is self.client:
+            self.connected = False
             self.is_device_active = False
-            if not await self.client.is_connected():
-                self.status_callback("Device disconnected, attempting to reconnect...")
-                self.connected = False
-                await self.connect()
-
-    def send_nibp_command(self):
-        """Send NIBP command synchronously"""
-        if self.client and self.client.is_connected:
-            command = bytearray([0x55, 0xAA, 0x04, 0x02, 0x01, 0xF8])
-            return command
-        return None
+            self.status_callback("Device disconnected")
+
+    def _backoff(self, attempt: int) -> float:
+        """Reintentos rápidos al principio, hasta reconnect_interval con jitter."""
+        delay = min(self.reconnect_interval, self.min_reconnect_interval * (2 ** attempt))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _load_cached_address(self) -> Optional[str]:
+        if not self.cache_path or not self.cache_path.exists():
+            return None
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f).get(self.cache_key)
+        except Exception as e:
+            log.warning("[BLE] Could not read address cache: %s", e)
+            return None
+
+    def _save_cached_address(self, address: Optional[str]) -> None:
+        if not self.cache_path or not address:
+            return
+        try:
+            cache = {}
+            if self.cache_path.exists():
+                with open(self.cache_path, "r") as f:
+                    cache = json.load(f)
+            if cache.get(self.cache_key) == address:
+                return
+            cache[self.cache_key] = address
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_path, "w") as f:
+                json.dump(cache, f)
+        except Exception as e:
+            log.warning("[BLE] Could not write address cache: %s", e)
@@ -0,0 +1,230 @@
+import asyncio
+import gzip
+import json
+import logging
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+try:                                    # opcional: solo para capturas .zst
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"BMCAP\x01"
+# por chunk: offset desde el inicio de la captura (µs) y largo
+RECORD = struct.Struct("<QH")
+MAX_CHUNK = 0xFFFF
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class CaptureWriter:
+    """
+    Graba los bytes crudos de un equipo tal como llegan del transporte.
+
+    Formato: ``MAGIC``, largo (uint32) + JSON con metadatos, y después un
+    registro por chunk: ``RECORD`` (µs desde el inicio, ``time.monotonic()``;
+    largo) seguido de los bytes. Todo el stream puede ir comprimido con
+    ``compression="gzip"`` o ``"zstd"`` (requiere ``zstandard``).
+
+    ``write`` es seguro desde el hilo lector USB o el callback de BLE.
+    """
+
+    def __init__(self, path, compression: Optional[str] = None, meta: Optional[dict] = None):
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError(f"unknown capture compression {compression!r}")
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd captures need the 'zstandard' package")
+        self.path = Path(path)
+        self.compression = compression
+        self.meta = dict(meta or {})
+        self.chunks = 0
+        self.bytes = 0
+        self._file = None
+        self._raw = None
+        self._lock = threading.Lock()
+        self._started = 0.0
+
+    def open(self) -> "CaptureWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        raw = open(self.path, "wb")
+        if self.compression == "gzip":
+            stream = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=5)
+        elif self.compression == "zstd":
+            stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+        else:
+            stream = raw
+        self._raw = raw
+        self._file = stream
+        self._started = time.monotonic()
+        meta = {"started_at": time.time(), **self.meta}
+        header = json.dumps(meta).encode()
+        stream.write(MAGIC + struct.pack("<I", len(header)) + header)
+        log.info("[CAPTURE] Recording to %s", self.path)
+        return self
+
+    def write(self, data, offset: Optional[float] = None) -> None:
+        """``offset``: segundos desde el inicio; por defecto, ahora."""
+        if offset is None:
+            offset = time.monotonic() - self._started
+        offset = int(offset * 1_000_000)
+        with self._lock:
+            if self._file is None:
+                return
+            for i in range(0, len(data), MAX_CHUNK):
+                piece = data[i:i + MAX_CHUNK]
+                self._file.write(RECORD.pack(offset, len(piece)))
+                self._file.write(piece)
+            self.chunks += 1
+            self.bytes += len(data)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            if not self._raw.closed:
+                self._raw.close()
+            self._file = self._raw = None
+        log.info("[CAPTURE] %s: %d chunks, %d bytes", self.path, self.chunks, self.bytes)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_capture(path) -> Tuple[dict, Iterator[Tuple[float, bytes]]]:
+    """
+    Abre una captura (cruda, gzip o zstd, se detecta sola) y devuelve
+    ``(meta, chunks)``; ``chunks`` rinde ``(segundos_desde_inicio, bytes)``.
+    Una captura cortada (corte de luz, kill) se lee hasta el último
+    registro completo.
+    """
+    raw = open(path, "rb")
+    head = raw.read(4)
+    raw.seek(0)
+    if head[:2] == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=raw, mode="rb")
+    elif head == ZSTD_MAGIC:
+        if zstandard is None:
+            raw.close()
+            raise RuntimeError("zstd captures need the 'zstandard' package")
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    else:
+        stream = raw
+
+    try:
+        if _read_exact(stream, len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a BerryMed capture")
+        (meta_len,) = struct.unpack("<I", _read_exact(stream, 4))
+        meta = json.loads(_read_exact(stream, meta_len))
+    except Exception:
+        stream.close()
+        raw.close()
+        raise
+
+    def chunks():
+        try:
+            while True:
+                header = _read_exact(stream, RECORD.size)
+                if len(header) < RECORD.size:
+                    return
+                offset, length = RECORD.unpack(header)
+                data = _read_exact(stream, length)
+                if len(data) < length:
+                    return
+                yield offset / 1_000_000, data
+        except (EOFError, OSError):
+            return                      # stream comprimido truncado
+        finally:
+            stream.close()
+            if not raw.closed:
+                raw.close()
+
+    return meta, chunks()
+
+
+def _read_exact(stream, n: int) -> bytes:
+    """``n`` bytes o menos si se acaba el archivo (los streams comprimidos
+    pueden devolver lecturas parciales)."""
+    out = stream.read(n)
+    while len(out) < n:
+        more = stream.read(n - len(out))
+        if not more:
+            break
+        out += more
+    return out
+
+
+class ReplayTransport:
+    """
+    Transporte que reproduce una captura sobre un parser, con la misma
+    interfaz que PM6750USBReader/BMPatientMonitor (connect, disconnect,
+    connected, last_data_timestamp, start_nibp).
+
+    ``speed=1`` respeta los tiempos grabados, ``speed=10`` va diez veces
+    más rápido y ``speed=0`` entrega todo lo más rápido posible. Al
+    terminar la captura ``connected`` pasa a False: el supervisor
+    reconecta y la reproducción vuelve a empezar.
+    """
+
+    def __init__(self, parser, path, speed: float = 1.0):
+        self.parser = parser
+        self.path = Path(path)
+        self.speed = speed
+        self.connected = False
+        self.last_data_timestamp = 0
+        self.chunks_received = 0
+        self.bytes_received = 0
+        self.replays = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> bool:
+        if not self.path.exists():
+            log.error("[REPLAY] Capture not found: %s", self.path)
+            return False
+        await self.disconnect()
+        self.connected = True
+        self._task = asyncio.create_task(self._replay())
+        log.info("[REPLAY] Playing %s at speed %s", self.path, self.speed or "max")
+        return True
+
+    async def disconnect(self):
+        self.connected = False
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def start_nibp(self):
+        log.info("[REPLAY] NIBP command ignored")
+
+    async def _replay(self):
+        loop = asyncio.get_running_loop()
+        _, chunks = read_capture(self.path)
+        started = loop.time()
+        try:
+            for n, (offset, data) in enumerate(chunks):
+                if self.speed > 0:
+                    delay = started + offset / self.speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                elif n % 64 == 0:
+                    await asyncio.sleep(0)      # ceder el loop
+                self.last_data_timestamp = time.monotonic()
+                self.chunks_received += 1
+                self.bytes_received += len(data)
+                self.parser.add_data(data)
+        finally:
+            chunks.close()
+        self.replays += 1
+        self.connected = False
+        log.info("[REPLAY] End of %s", self.path)
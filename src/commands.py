@@ -0,0 +1,64 @@
+import time
+from typing import Any, Dict, Optional
+
+from src.metrics import Histogram
+
+START = "start"
+STOP = "stop"
+START_NIBP = "start_nibp"
+
+
+class Command:
+    """
+    Un evento de Pusher camino al equipo, con marcas ``time.monotonic()``:
+    recibido (hilo de Pusher), encolado (loop), iniciado y terminado.
+    """
+
+    __slots__ = ("name", "event_data", "received_at", "queued_at", "started_at", "finished_at")
+
+    def __init__(self, name: str, event_data: Any = None):
+        self.name = name
+        self.event_data = event_data
+        self.received_at = time.monotonic()
+        self.queued_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def queue_delay(self) -> float:
+        """Recibido -> el loop lo empieza a ejecutar."""
+        return (self.started_at or time.monotonic()) - self.received_at
+
+    @property
+    def latency(self) -> float:
+        """Recibido -> comando aplicado / escrito al equipo."""
+        return (self.finished_at or time.monotonic()) - self.received_at
+
+
+class CommandStats:
+    """Contadores y latencias de los comandos procesados por un equipo."""
+
+    # los comandos se aplican en el loop: interesan los milisegundos
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.failed = 0
+        self.queue_delay = Histogram(self.BUCKETS)
+        self.latency = Histogram(self.BUCKETS)
+
+    def observe(self, command: Command, ok: bool = True) -> None:
+        self.counts[command.name] = self.counts.get(command.name, 0) + 1
+        if not ok:
+            self.failed += 1
+        self.queue_delay.observe(command.queue_delay)
+        self.latency.observe(command.latency)
+
+    def as_dict(self) -> dict:
+        return {
+            "counts": dict(self.counts),
+            "failed": self.failed,
+            "queue_p99": self.queue_delay.quantile(0.99),
+            "latency_p50": self.latency.quantile(0.5),
+            "latency_p99": self.latency.quantile(0.99),
+        }
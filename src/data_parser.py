@@ -1,14 +1,40 @@
-import asyncio
+import logging
 import time                # ← añadido
+from array import array
 from typing import Callable, Dict, Optional, Tuple
 
+from src.vitals import VitalsRecord
+from src.waveform_buffer import WaveformRing
+
+log = logging.getLogger(__name__)
+
 
 class BMDataParser:
     PACKAGE_MIN_LENGTH = 4
-    PACKAGE_HEADER = [0x55, 0xAA]
-
-    def __init__(self):
-        self.raw_buffer = []
+    PACKAGE_HEADER = b"\x55\xAA"
+    # bytes already consumed at the front of raw_buffer before it is compacted
+    COMPACT_THRESHOLD = 4096
+    # tipo de paquete -> método decodificador; para un tipo nuevo basta con
+    # agregarlo acá y en self.callbacks
+    DECODERS = {
+        0x01: "_decode_ecg_wave",
+        0x02: "_decode_ecg_params",
+        0x03: "_decode_nibp_params",
+        0x04: "_decode_spo2_params",
+        0x05: "_decode_temp_params",
+        0x30: "_decode_peak",
+        0x31: "_decode_peak",
+        0xFE: "_decode_spo2_wave",
+        0xFF: "_decode_resp_wave",
+    }
+    WAVEFORM_TYPES = (0x01, 0xFE, 0xFF)
+    # muestras/segundo máximas por onda; dimensionan los ring buffers
+    WAVEFORM_SAMPLE_RATES = {"ecg": 250, "spo2": 100, "resp": 125}
+
+    def __init__(self, waveform_seconds: int = 5):
+        # bytes recibidos + offset de lectura: no se copia el buffer por frame
+        self.raw_buffer = bytearray()
+        self._read_pos = 0
         self.callbacks: Dict[int, Tuple[str, Optional[Callable]]] = {
             0x01: ("on_ecg_waveform_received", None),
             0x02: ("on_ecg_params_received", None),
@@ -20,22 +46,35 @@ class BMDataParser:
             0xFE: ("on_spo2_waveform_received", None),
             0xFF: ("on_resp_waveform_received", None),
         }
+        # tabla de despacho precompilada: solo tipos con callback registrado
+        self._dispatch: Dict[int, Tuple[Callable, Callable]] = {}
+
+        # modo batch de ondas: muestras acumuladas por add_data
+        self._batch_callbacks: Dict[int, Callable] = {}
+        self._batch_pending: Dict[int, array] = {}
+        self._sample_index: Dict[int, int] = dict.fromkeys(self.WAVEFORM_TYPES, 0)
 
         # Data storage with default values
-        self.data = {
-            "spo2": [],   # SpO2 waveform
-            "ecg": [],    # ECG waveform
-            "resp": [],   # Respiratory waveform
-            "vitalSigns": {
-                "heartRate": "- -",
-                "nibp": "- - /- -",
-                "spo2Pulse": "- - /- -",
-                "temperature": "- -",
-                "respRate": "- -",
-            },
-        }
-        self.max_waveform_points = 25
-        self.last_update_time = 0
+        self.waveform_seconds = waveform_seconds
+        self.data = self._new_data()
+        # signos vitales numéricos; el texto se arma al serializar
+        self.vitals = VitalsRecord()
+        # número de secuencia de cambios; el seq del último cambio de cada
+        # campo queda en vitals.seq (flags "dirty" para el envío incremental)
+        self.seq = 0
+        # time.time() del lote en curso: add_data lee el reloj una vez y los
+        # decodificadores lo usan para vitals.updated_at y las ondas
+        self._now = time.time()
+
+        # aviso de frames nuevos: on_frames(urgent) al final de cada add_data
+        self.on_frames: Optional[Callable[[bool], None]] = None
+        self.frames_decoded = 0
+        self._urgent = False
+
+        # contadores para métricas (se leen al hacer scrape, no se publican)
+        self.frames_by_type = [0] * 256
+        self.checksum_failures = 0
+        self.bytes_resynced = 0
 
     # ---------- API ---------------------------------------------------------
     # def register_callback(self, name: str, callback: Callable) -> None:
@@ -43,161 +82,283 @@ class BMDataParser:
     #         if callback_name == name:
     #             self.callbacks[key] = (callback_name, callback)
     #             break
-    def register_callback(self, name: str, callback: Callable) -> None:
+    def register_callback(
+        self, name: str, callback: Callable, batch: bool = False
+    ) -> None:
+        """
+        Registra un callback por nombre.
+
+        Con ``batch=True`` (solo ondas ECG/SpO2/RESP) el callback se llama
+        una vez por ``add_data`` como ``callback(samples, start_index,
+        timestamp)``: ``samples`` es un ``array('B')`` con todas las muestras
+        decodificadas (``numpy.frombuffer(samples, numpy.uint8)`` lo expone
+        sin copia), ``start_index`` el índice de la primera muestra desde
+        ``reset_data`` y ``timestamp`` el ``time.time()`` del lote.
+        """
         found = False
         for key, (callback_name, _) in self.callbacks.items():
             if callback_name == name:
+                if batch and key not in self.WAVEFORM_TYPES:
+                    log.warning("batch mode only for waveforms: %s", name)
+                    return
                 self.callbacks[key] = (callback_name, callback)
+                self._batch_callbacks.pop(key, None)
+                self._batch_pending.pop(key, None)
+                if callback is None:
+                    self._dispatch.pop(key, None)
+                elif batch:
+                    pending = array("B")
+                    self._batch_callbacks[key] = callback
+                    self._batch_pending[key] = pending
+                    self._dispatch[key] = (
+                        getattr(self, self.DECODERS[key]), pending.append
+                    )
+                else:
+                    self._dispatch[key] = (
+                        getattr(self, self.DECODERS[key]), callback
+                    )
                 found = True
 
                 break
         if not found:
-            print("[DBG][WARN] callback name not found:", name)
+            log.warning("callback name not found: %s", name)
 
 
     def add_data(self, data: bytearray) -> None:
-        self.raw_buffer.extend(data)
-
-        while len(self.raw_buffer) >= self.PACKAGE_MIN_LENGTH:
-            try:
-                start_idx = self._find_package_start()
+        """
+        Agrega bytes crudos de cualquier tamaño (notificaciones BLE, lecturas
+        USB) y decodifica los frames completos. El framing se hace solo acá:
+        los transportes no deben re-armar frames antes de llamar.
+        """
+        self._now = time.time()
+        buf = self.raw_buffer
+        buf.extend(data)
+        pos = self._read_pos
+        end = len(buf)
+        decoded = 0
+        bad = 0
+        skipped = 0
+        by_type = self.frames_by_type
+
+        with memoryview(buf) as view:
+            while end - pos >= self.PACKAGE_MIN_LENGTH:
+                start_idx = self._find_package_start(pos)
                 if start_idx == -1:
-                    self.raw_buffer = self.raw_buffer[-1:]
-                    continue
+                    # conservar el último byte: puede ser el inicio del header
+                    skipped += end - 1 - pos
+                    pos = end - 1
+                    break
+                skipped += start_idx - pos
+                if start_idx + 2 >= end:
+                    pos = start_idx
+                    break
 
-                package_length = self.raw_buffer[start_idx + 2]
+                package_length = buf[start_idx + 2]
                 end_idx = start_idx + package_length + 2
-
-                if end_idx > len(self.raw_buffer):
+                if end_idx > end:
+                    pos = start_idx
                     break
 
-                package = self.raw_buffer[start_idx:end_idx]
-                self.raw_buffer = self.raw_buffer[end_idx:]
-
-                if self._check_sum(package):
-                    self._parse_package(package)
+                package = view[start_idx:end_idx]
+                try:
+                    if self._check_sum(package):
+                        pos = end_idx
+                        decoded += 1
+                        by_type[package[3]] += 1
+                        self._parse_package(package)
+                    else:
+                        # resync justo después del header descartado
+                        bad += 1
+                        skipped += 2
+                        pos = start_idx + 2
+                except Exception as e:
+                    log.warning("Error processing package: %s", e)
+                    pos = start_idx + 2
+                finally:
+                    package.release()
+
+        if bad:
+            self.checksum_failures += bad
+        if skipped:
+            self.bytes_resynced += skipped
+
+        if self._batch_pending:
+            self._flush_batches()
+
+        if decoded:
+            self.frames_decoded += decoded
+            if self.on_frames is not None:
+                urgent, self._urgent = self._urgent, False
+                self.on_frames(urgent)
+
+        # reset_data() pudo reemplazar el buffer desde un callback
+        if self.raw_buffer is not buf:
+            return
+        if pos >= end:
+            buf.clear()
+            pos = 0
+        elif pos >= self.COMPACT_THRESHOLD:
+            del buf[:pos]
+            pos = 0
+        self._read_pos = pos
+
+    def get_current_data(
+        self, vitals_format: str = "display", since: Optional[Dict[str, int]] = None
+    ):
+        """
+        Datos listos para serializar: cada onda a frecuencia completa y los
+        signos vitales, como ``vitalSigns`` (textos de pantalla) o, con
+        ``vitals_format="numeric"``, como ``vitals`` (números, ver
+        ``VitalsRecord.as_dict``).
+
+        Sin ``since`` van las ondas del último segundo; con ``since`` (onda
+        -> índice absoluto, como ``WaveformRing.total``) las muestras desde
+        ese índice que sigan en el buffer.
+        """
+        data = self.data
+        if since is None:
+            rates = self.WAVEFORM_SAMPLE_RATES
+            out = {name: data[name].snapshot(rates[name]).tolist() for name in ("spo2", "ecg", "resp")}
+        else:
+            out = {name: data[name].since(since[name]).tolist() for name in ("spo2", "ecg", "resp")}
+        if vitals_format == "numeric":
+            out["vitals"] = self.vitals.as_dict()
+        else:
+            out["vitalSigns"] = self.vitals.display()
+        return out
 
+    # ---------- helpers -----------------------------------------------------
+    def _flush_batches(self) -> None:
+        timestamp = self._now
+        for key, pending in self._batch_pending.items():
+            if not pending:
+                continue
+            # el lote pasa a ser del callback; se arma uno nuevo
+            fresh = array("B")
+            self._batch_pending[key] = fresh
+            self._dispatch[key] = (self._dispatch[key][0], fresh.append)
+
+            start_index = self._sample_index[key]
+            self._sample_index[key] = start_index + len(pending)
+            try:
+                self._batch_callbacks[key](pending, start_index, timestamp)
             except Exception as e:
-                print(f"Error processing package: {e}")
-                self.raw_buffer = self.raw_buffer[-1:]
+                log.warning("Error in callback %s: %s", self.callbacks[key][0], e)
 
-    def get_current_data(self):
-        return self.data
-
-    # ---------- helpers -----------------------------------------------------
-    def _find_package_start(self) -> int:
-        for i in range(len(self.raw_buffer) - 1):
-            if (
-                self.raw_buffer[i]     == self.PACKAGE_HEADER[0] and
-                self.raw_buffer[i + 1] == self.PACKAGE_HEADER[1]
-            ):
-                return i
-        return -1
+    def _find_package_start(self, start: int = 0) -> int:
+        return self.raw_buffer.find(self.PACKAGE_HEADER, start)
 
     @staticmethod
-    def _check_sum(package: list) -> bool:
+    def _check_sum(package) -> bool:
         checksum = ~sum(package[2:-1]) & 0xFF
         return checksum == package[-1]
 
-    def _format_value(self, value) -> str:
-        return "-" if value == 0 else str(value)
+    def _set_vital(self, field: str, value) -> bool:
+        vitals = self.vitals
+        vitals.updated_at[field] = self._now
+        if getattr(vitals, field) != value:
+            setattr(vitals, field, value)
+            self.seq += 1
+            vitals.seq[field] = self.seq
+            return True
+        return False
+
+    def _set_status(self, field: str, value: int) -> None:
+        # alarmas y estado (cable suelto, sensor fuera): un cambio no espera
+        # al flush; el primer paquete solo fija el valor inicial
+        vitals = self.vitals
+        previous = getattr(vitals, field)
+        if previous != value:
+            setattr(vitals, field, value)
+            self.seq += 1
+            vitals.seq[field] = self.seq
+            if previous is not None:
+                self._urgent = True
 
     # ---------- main package handler ---------------------------------------
-    def _parse_package(self, package: list) -> None:
-        package_type = package[3]
-        if package_type not in self.callbacks:
-            return
-
-        callback_name, callback = self.callbacks[package_type]
-        if callback is None:
+    def _parse_package(self, package) -> None:
+        entry = self._dispatch.get(package[3])
+        if entry is None:
             return
 
+        decode, callback = entry
         try:
-            # tiempo seguro para cualquier hilo
-            try:
-                current_time = int(asyncio.get_event_loop().time())
-            except RuntimeError:
-                current_time = int(time.time())
-
-            if callback_name == "on_spo2_waveform_received":
-                if current_time > self.last_update_time:
-                    self.data["spo2"] = []
-                    self.last_update_time = current_time
-                if len(self.data["spo2"]) < self.max_waveform_points:
-                    self.data["spo2"].append(package[4])
-                callback(package[4])
-
-            elif callback_name == "on_ecg_waveform_received":
-                if current_time > self.last_update_time:
-                    self.data["ecg"] = []
-                if len(self.data["ecg"]) < self.max_waveform_points:
-                    self.data["ecg"].append(package[4])
-                callback(package[4])
-
-            elif callback_name == "on_resp_waveform_received":
-                if current_time > self.last_update_time:
-                    self.data["resp"] = []
-                if len(self.data["resp"]) < self.max_waveform_points:
-                    self.data["resp"].append(package[4])
-                callback(package[4])
-
-            elif callback_name == "on_ecg_params_received":
-                heart_rate = self._format_value(package[5])
-                resp_rate  = self._format_value(package[6])
-                self.data["vitalSigns"]["heartRate"] = heart_rate
-                self.data["vitalSigns"]["respRate"]  = resp_rate
-                callback(package[4], package[5], package[6])
-
-            elif callback_name == "on_spo2_params_received":
-                spo2  = package[5]
-                pulse = package[6]
-                if spo2 > 100:
-                    self.data["vitalSigns"]["spo2Pulse"] = "- - /- -"
-                else:
-                    spo2_val  = self._format_value(spo2)
-                    pulse_val = self._format_value(pulse)
-                    self.data["vitalSigns"]["spo2Pulse"] = f"{spo2_val}/{pulse_val}"
-                callback(package[4], spo2, pulse)
-
-            elif callback_name == "on_temp_params_received":
-                temp = (package[5] * 10 + package[6]) / 10.0
-                temp_str = self._format_value(temp)
-                self.data["vitalSigns"]["temperature"] = temp_str
-                callback(package[4], temp)
-
-            elif callback_name == "on_nibp_params_received":
-                sys = package[6]
-                dia = package[8]
-                sys_val = self._format_value(sys)
-                dia_val = self._format_value(dia)
-                if sys != 0 or dia != 0:
-                    self.data["vitalSigns"]["nibp"] = f"{sys_val}/{dia_val}"
-                if package[4] == 0:
-                    callback(package[4], package[5] * 2, sys, package[7], dia)
-                else: # retro compatibilidad con otras versiones
-                    callback(package[4], package[5] * 2, sys, package[7], dia)
-
-            elif callback_name in ["on_ecg_peak_received", "on_spo2_peak_received"]:
-                callback()
-
+            decode(package, callback)
         except Exception as e:
-            print(f"Error in callback {callback_name}: {e}")
+            log.warning("Error in callback %s: %s", self.callbacks[package[3]][0], e)
+
+    # ---------- decoders (uno por tipo de paquete) --------------------------
+    def _decode_spo2_wave(self, package, callback) -> None:
+        self.data["spo2"].append(package[4])
+        callback(package[4])
+
+    def _decode_ecg_wave(self, package, callback) -> None:
+        self.data["ecg"].append(package[4])
+        callback(package[4])
+
+    def _decode_resp_wave(self, package, callback) -> None:
+        self.data["resp"].append(package[4])
+        callback(package[4])
+
+    # los valores quedan tal cual (0 = sin medición); SpO2 > 100 queda None
+    def _decode_ecg_params(self, package, callback) -> None:
+        self._set_status("ecg_status", package[4])
+        self._set_vital("heart_rate", package[5])
+        self._set_vital("resp_rate", package[6])
+        callback(package[4], package[5], package[6])
+
+    def _decode_spo2_params(self, package, callback) -> None:
+        spo2  = package[5]
+        pulse = package[6]
+        self._set_status("spo2_status", package[4])
+        if spo2 > 100:
+            self._set_vital("spo2", None)
+            self._set_vital("pulse_rate", None)
+        else:
+            self._set_vital("spo2", spo2)
+            self._set_vital("pulse_rate", pulse)
+        callback(package[4], spo2, pulse)
+
+    def _decode_temp_params(self, package, callback) -> None:
+        temp = (package[5] * 10 + package[6]) / 10.0
+        self._set_status("temp_status", package[4])
+        self._set_vital("temperature", temp)
+        callback(package[4], temp)
+
+    def _decode_nibp_params(self, package, callback) -> None:
+        sys = package[6]
+        dia = package[8]
+        self._set_status("nibp_status", package[4])
+        if sys != 0 or dia != 0:
+            changed = self._set_vital("nibp_sys", sys)
+            changed = self._set_vital("nibp_dia", dia) or changed
+            self._set_vital("nibp_mean", package[7])
+            if changed:
+                self._urgent = True         # resultado nuevo: no esperar al flush
+        # mismo callback para todas las versiones de firmware
+        callback(package[4], package[5] * 2, sys, package[7], dia)
+
+    def _decode_peak(self, package, callback) -> None:
+        callback()
+
+    def _new_data(self) -> dict:
+        rates = self.WAVEFORM_SAMPLE_RATES
+        seconds = self.waveform_seconds
+        return {
+            "spo2": WaveformRing(rates["spo2"] * seconds),   # SpO2 waveform
+            "ecg": WaveformRing(rates["ecg"] * seconds),     # ECG waveform
+            "resp": WaveformRing(rates["resp"] * seconds),   # Respiratory waveform
+        }
 
     def reset_data(self):
-        # limpiar buffer crudo y timestamp
-        self.raw_buffer.clear()
-        self.last_update_time = 0
+        # limpiar buffer crudo (se reemplaza: puede haber un memoryview vivo
+        # sobre el anterior si add_data está en curso)
+        self.raw_buffer = bytearray()
+        self._read_pos = 0
+        self._sample_index = dict.fromkeys(self.WAVEFORM_TYPES, 0)
+        for pending in self._batch_pending.values():
+            del pending[:]
 
         # restaurar valores por defecto
-        self.data = {
-            "spo2": [],
-            "ecg": [],
-            "resp": [],
-            "vitalSigns": {
-                "heartRate": "- -",
-                "nibp": "- - /- -",
-                "spo2Pulse": "- - /- -",
-                "temperature": "- -",
-                "respRate": "- -",
-            },
-        }
\ No newline at end of file
+        self.data = self._new_data()
+        self.vitals = VitalsRecord()
@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import struct
+import threading
+import time
+from array import array
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from src.data_parser import BMDataParser
+
+log = logging.getLogger(__name__)
+
+# tipo de paquete de onda -> clave en parser.data
+WAVEFORM_KEYS = {0x01: "ecg", 0xFE: "spo2", 0xFF: "resp"}
+
+
+class ShmRing:
+    """
+    Ring de bytes single-producer/single-consumer en memoria compartida.
+
+    Cabecera de 32 bytes (uint64): índice de escritura y de lectura
+    (monotónicos), y el índice de escritura y la generación del último
+    ``reset``. El productor solo escribe los suyos y el consumidor solo el
+    de lectura, así no hace falta lock entre procesos.
+    """
+
+    HEADER = 32
+
+    def __init__(self, name: Optional[str] = None, capacity: int = 1 << 20):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.HEADER + capacity)
+            self.shm.buf[:self.HEADER] = bytes(self.HEADER)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self.capacity = self.shm.size - self.HEADER
+        self._data = self.shm.buf[self.HEADER:self.HEADER + self.capacity]
+        self.overflows = 0
+        # último reset publicado (productor) o visto (consumidor)
+        self.generation = 0
+
+    def _get(self, offset: int) -> int:
+        return struct.unpack_from("<Q", self.shm.buf, offset)[0]
+
+    def _put(self, offset: int, value: int) -> None:
+        struct.pack_into("<Q", self.shm.buf, offset, value)
+
+    def write(self, data) -> bool:
+        """Productor: encola ``data`` entero o nada (False si no entra)."""
+        n = len(data)
+        head = self._get(0)
+        if n > self.capacity - (head - self._get(8)):
+            self.overflows += 1
+            return False
+        pos = head % self.capacity
+        first = min(n, self.capacity - pos)
+        self._data[pos:pos + first] = data[:first]
+        if first < n:
+            self._data[0:n - first] = data[first:]
+        self._put(0, head + n)
+        return True
+
+    def reset(self) -> None:
+        """
+        Productor: lo escrito hasta ahora queda descartado. El consumidor lo
+        saltea y ve una generación nueva en ``read``.
+        """
+        self.generation += 1
+        self._put(16, self._get(0))
+        self._put(24, self.generation)
+
+    def read(self) -> Tuple[int, bytes]:
+        """
+        Consumidor: ``(generación, bytes)`` con todo lo disponible. Si la
+        generación cambió, lo anterior al reset ya se descartó.
+        """
+        generation = self._get(24)
+        tail = self._get(8)
+        if generation != self.generation:
+            self.generation = generation
+            tail = max(tail, self._get(16))
+            self._put(8, tail)
+        head = self._get(0)
+        n = head - tail
+        if not n:
+            return generation, b""
+        pos = tail % self.capacity
+        first = min(n, self.capacity - pos)
+        out = bytes(self._data[pos:pos + first])
+        if first < n:
+            out += bytes(self._data[0:n - first])
+        if self._get(24) != generation:
+            # reset mientras se copiaba: se relee en la próxima vuelta
+            return generation, b""
+        self._put(8, tail + n)
+        return generation, out
+
+    def close(self) -> None:
+        self._data.release()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _ShardParser(BMDataParser):
+    """
+    Parser del worker: hace framing, checksum y decodificación de ondas;
+    los frames de parámetros (pocos por segundo) se reenvían crudos para
+    que el parser del loop los despache con sus propios callbacks.
+    """
+
+    def __init__(self):
+        super().__init__(waveform_seconds=1)
+        self.forwarded: List[bytes] = []
+        self.waves: Dict[int, bytes] = {}
+        for key in WAVEFORM_KEYS:
+            name = self.callbacks[key][0]
+            self.register_callback(name, self._collect(key), batch=True)
+
+    def _collect(self, key):
+        def collect(samples, start_index, timestamp):
+            self.waves[key] = self.waves.get(key, b"") + samples.tobytes()
+        return collect
+
+    def _parse_package(self, package) -> None:
+        if package[3] in WAVEFORM_KEYS:
+            super()._parse_package(package)
+        else:
+            self.forwarded.append(bytes(package))
+
+    def take(self):
+        frames, self.frames_decoded = self.frames_decoded, 0
+        waves, self.waves = self.waves, {}
+        forwarded, self.forwarded = self.forwarded, []
+        by_type = {t: n for t, n in enumerate(self.frames_by_type) if n}
+        counters = (by_type, self.checksum_failures, self.bytes_resynced)
+        self.frames_by_type = [0] * 256
+        self.checksum_failures = self.bytes_resynced = 0
+        return frames, waves, forwarded, counters
+
+
+def _worker_main(shard: Dict[str, str], results, wakeup, stop, idle_wait: float):
+    """Proceso worker: decodifica los dispositivos de su shard."""
+    rings = {key: ShmRing(name) for key, name in shard.items()}
+    parsers = {key: _ShardParser() for key in shard}
+    try:
+        while not stop.is_set():
+            busy = False
+            for key, ring in rings.items():
+                generation = ring.generation
+                new_generation, chunk = ring.read()
+                parser = parsers[key]
+                if new_generation != generation:
+                    # reset_data() del lado del loop: sin frames a medias
+                    parser.reset_data()
+                    parser.take()
+                if not chunk:
+                    continue
+                busy = True
+                parser.add_data(chunk)
+                frames, waves, forwarded, counters = parser.take()
+                if frames or counters[1] or counters[2]:
+                    results.put((key, new_generation, frames, waves, forwarded, counters))
+            if not busy:
+                wakeup.wait(idle_wait)
+                wakeup.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for ring in rings.values():
+            ring.close()
+
+
+class RemoteParser(BMDataParser):
+    """
+    Parser del lado del loop cuando se decodifica en un worker.
+
+    ``add_data`` solo copia los bytes al ring compartido del dispositivo;
+    lo decodificado vuelve por ``_apply`` (en el hilo del loop) y queda en
+    ``data``/``vitals`` como con un BMDataParser normal.
+    """
+
+    def __init__(self, ring: ShmRing, wakeup, **kwargs):
+        super().__init__(**kwargs)
+        self._ring = ring
+        self._wakeup = wakeup
+
+    @property
+    def ring_overflows(self) -> int:
+        """Escrituras rechazadas por ring lleno (el worker no da abasto)."""
+        return self._ring.overflows
+
+    def add_data(self, data: bytearray) -> None:
+        if not self.try_add_data(data):
+            log.warning("[DECODE] Decode ring full, dropped %d bytes from the device", len(data))
+
+    def try_add_data(self, data) -> bool:
+        """Como ``add_data``, pero devuelve False si el ring está lleno."""
+        if not self._ring.write(data):
+            return False
+        self._wakeup.set()
+        return True
+
+    def reset_data(self):
+        super().reset_data()
+        # el worker descarta lo que quedó en el ring y su frame a medias
+        self._ring.reset()
+
+    def _apply(
+        self, generation: int, frames: int, waves: Dict[int, bytes], forwarded: List[bytes], counters=None
+    ) -> None:
+        if generation != self._ring.generation:
+            return          # decodificado antes del último reset_data()
+        timestamp = self._now = time.time()
+        if counters is not None:
+            by_type, bad, skipped = counters
+            for packet_type, n in by_type.items():
+                self.frames_by_type[packet_type] += n
+            self.checksum_failures += bad
+            self.bytes_resynced += skipped
+        for key, raw in waves.items():
+            samples = array("B", raw)
+            self.data[WAVEFORM_KEYS[key]].extend(samples)
+            start_index = self._sample_index[key]
+            self._sample_index[key] = start_index + len(samples)
+            callback = self.callbacks[key][1]
+            if callback is None:
+                continue
+            try:
+                if key in self._batch_callbacks:
+                    callback(samples, start_index, timestamp)
+                else:
+                    for value in samples:
+                        callback(value)
+            except Exception as e:
+                log.warning("Error in callback %s: %s", self.callbacks[key][0], e)
+
+        for package in forwarded:
+            self._parse_package(package)
+
+        if not frames:
+            return
+        self.frames_decoded += frames
+        if self.on_frames is not None:
+            urgent, self._urgent = self._urgent, False
+            self.on_frames(urgent)
+
+    def _parse_package(self, package) -> None:
+        # los frames reenviados siempre actualizan los vitales, aunque no
+        # haya callback registrado para ese tipo
+        entry = self._dispatch.get(package[3])
+        if entry is None:
+            name = self.DECODERS.get(package[3])
+            if name is not None:
+                getattr(self, name)(package, lambda *args: None)
+            return
+        super()._parse_package(package)
+
+
+class DecodePool:
+    """
+    Reparte la decodificación de muchos dispositivos entre procesos.
+
+    Cada dispositivo tiene un ring en memoria compartida (loop -> worker);
+    los workers devuelven lotes decodificados por una ``mp.Queue`` que un
+    hilo vuelca al loop con ``call_soon_threadsafe``. Los dispositivos se
+    registran con ``parser_for`` antes de ``start``.
+    """
+
+    def __init__(self, workers: int, ring_size: int = 1 << 20, idle_wait: float = 0.02):
+        self.workers = max(1, workers)
+        self.ring_size = ring_size
+        self.idle_wait = idle_wait
+        ctx = mp.get_context("spawn")
+        self._ctx = ctx
+        self._results = ctx.Queue()
+        self._stop = ctx.Event()
+        self._wakeups = [ctx.Event() for _ in range(self.workers)]
+        self._shards: List[Dict[str, str]] = [{} for _ in range(self.workers)]
+        self._rings: Dict[str, ShmRing] = {}
+        self._parsers: Dict[str, RemoteParser] = {}
+        self._procs = []
+        self._pump_thread = None
+        self._loop = None
+
+    def parser_for(self, device_key: str, **parser_kwargs) -> RemoteParser:
+        if self._procs:
+            raise RuntimeError("devices must be registered before start()")
+        shard = len(self._parsers) % self.workers
+        ring = ShmRing(capacity=self.ring_size)
+        parser = RemoteParser(ring, self._wakeups[shard], **parser_kwargs)
+        self._rings[device_key] = ring
+        self._parsers[device_key] = parser
+        self._shards[shard][device_key] = ring.name
+        return parser
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self._loop = loop or asyncio.get_running_loop()
+        for shard, wakeup in zip(self._shards, self._wakeups):
+            if not shard:
+                continue
+            proc = self._ctx.Process(
+                target=_worker_main,
+                args=(shard, self._results, wakeup, self._stop, self.idle_wait),
+                daemon=True,
+            )
+            proc.start()
+            self._procs.append(proc)
+        self._pump_thread = threading.Thread(target=self._pump, daemon=True)
+        self._pump_thread.start()
+        log.info("[DECODE] %d workers para %d dispositivos", len(self._procs), len(self._parsers))
+
+    def stop(self) -> None:
+        """Bloquea hasta ~2 s por worker: desde el loop, con ``asyncio.to_thread``."""
+        self._stop.set()
+        for wakeup in self._wakeups:
+            wakeup.set()
+        for proc in self._procs:
+            proc.join(timeout=2)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs = []
+        self._results.put(None)
+        if self._pump_thread:
+            self._pump_thread.join(timeout=2)
+        for ring in self._rings.values():
+            ring.close()
+        self._rings = {}
+
+    def _pump(self) -> None:
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            key, generation, frames, waves, forwarded, counters = item
+            parser = self._parsers.get(key)
+            if parser is None:
+                continue
+            try:
+                self._loop.call_soon_threadsafe(
+                    parser._apply, generation, frames, waves, forwarded, counters
+                )
+            except RuntimeError:
+                return      # loop cerrado
@@ -0,0 +1,43 @@
+import logging
+import time
+from typing import Dict, Tuple
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Deja pasar un mensaje por ``interval`` segundos por cada (logger,
+    formato): un error que se repite en cada frame o en cada tick sale una
+    vez y el siguiente que pase avisa cuántos se descartaron.
+
+    Se agrupa por el formato (``record.msg``) y no por el texto final, así
+    que conviene loguear con argumentos (``log.warning("x %s", v)``).
+    """
+
+    def __init__(self, interval: float = 10.0):
+        super().__init__()
+        self.interval = interval
+        self._seen: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.interval <= 0:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        last, suppressed = self._seen.get(key, (0.0, 0))
+        if last and now - last < self.interval:
+            self._seen[key] = (last, suppressed + 1)
+            return False
+        self._seen[key] = (now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+        return True
+
+
+def setup_logging(level: str = "INFO", rate_limit: float = 10.0) -> None:
+    """Consola con el mismo formato que los prints: ``[LEVEL] mensaje``."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    handler.addFilter(RateLimitFilter(rate_limit))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(str(level).upper())
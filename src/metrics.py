@@ -0,0 +1,181 @@
+import asyncio
+import bisect
+import json
+import logging
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Histograma acumulado con buckets fijos (cota superior inclusiva)."""
+
+    BUCKETS: Tuple[float, ...] = (1, 10, 100, 1000)
+
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets) if buckets else self.BUCKETS
+        self.counts = [0] * (len(self.buckets) + 1)    # el último es +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Cota superior del bucket que contiene el cuantil ``q``."""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, n in zip(self.buckets + (math.inf,), self.counts):
+            running += n
+            if running >= target:
+                return bound
+        return math.inf
+
+
+# (nombre, tipo, ayuda, labels, valor); valor es un número o un Histogram
+Sample = Tuple[str, str, str, Dict[str, str], object]
+
+
+class MetricsRegistry:
+    """
+    Métricas leídas al momento del scrape.
+
+    Los contadores del camino caliente (parser, transportes, uploader) son
+    atributos enteros de cada objeto; los ``collectors`` registrados los
+    recorren solo cuando alguien pide ``/metrics``, sin costo por frame.
+    """
+
+    def __init__(self, prefix: str = "berrymed"):
+        self.prefix = prefix
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def register(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        self._collectors.append(collector)
+
+    def collect(self) -> List[Sample]:
+        samples = []
+        for collector in self._collectors:
+            samples.extend(collector())
+        return samples
+
+    def render_text(self) -> str:
+        """Formato de texto de Prometheus (0.0.4)."""
+        # cada familia tiene que salir junta, con un solo HELP/TYPE
+        families: Dict[str, list] = {}
+        for sample in self.collect():
+            families.setdefault(sample[0], []).append(sample)
+
+        lines = []
+        for name, samples in families.items():
+            full = f"{self.prefix}_{name}"
+            _, kind, help_text, _, _ = samples[0]
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for _, _, _, labels, value in samples:
+                lines.extend(_render(full, labels, value))
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self) -> dict:
+        """Lo mismo en JSON: ``{nombre: [{labels, value}, ...]}``."""
+        out: Dict[str, list] = {}
+        for name, _, _, labels, value in self.collect():
+            if isinstance(value, Histogram):
+                value = {
+                    "count": value.count,
+                    "sum": value.total,
+                    "p50": value.quantile(0.5),
+                    "p99": value.quantile(0.99),
+                }
+            out.setdefault(name, []).append({"labels": labels, "value": value})
+        return out
+
+
+class MetricsServer:
+    """
+    Endpoint HTTP local: ``/metrics`` (Prometheus) y ``/metrics.json``.
+
+    ``serve()`` corre hasta que lo cancelan (un servicio del runtime).
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+
+    async def serve(self) -> None:
+        # aiohttp.web solo si hay METRICS_PORT: Histogram se usa en todos lados
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._text)
+        app.router.add_get("/metrics.json", self._json)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+            log.info("[METRICS] Serving http://%s:%s/metrics", self.host, self.port)
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    async def _text(self, request):
+        from aiohttp import web
+
+        return web.Response(
+            text=self.registry.render_text(),
+            content_type="text/plain",
+            charset="utf-8",
+        )
+
+    async def _json(self, request):
+        from aiohttp import web
+
+        return web.Response(
+            text=json.dumps(self.registry.as_dict(), default=str),
+            content_type="application/json",
+        )
+
+
+def _render(full: str, labels: Dict[str, str], value) -> List[str]:
+    if not isinstance(value, Histogram):
+        return [f"{full}{_labels(labels)} {_number(value)}"]
+    lines = []
+    running = 0
+    for bound, n in zip(value.buckets + (math.inf,), value.counts):
+        running += n
+        le = "+Inf" if bound == math.inf else _number(bound)
+        lines.append(f"{full}_bucket{_labels(labels, le=le)} {running}")
+    lines.append(f"{full}_sum{_labels(labels)} {_number(value.total)}")
+    lines.append(f"{full}_count{_labels(labels)} {value.count}")
+    return lines
+
+
+def _labels(labels: Dict[str, str], **extra) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in items.items())
+    return "{" + body + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+
+class DataNotifier:
+    """
+    Avisa al loop asyncio que el parser decodificó frames nuevos.
+
+    ``notify`` se puede llamar desde cualquier hilo (el lector USB corre en
+    el suyo): desde otro hilo se agenda con ``call_soon_threadsafe`` y los
+    avisos se agrupan hasta que el loop los procese, así una ráfaga de
+    chunks cuesta un solo wakeup. ``urgent`` marca datos que no deben
+    esperar al próximo flush (resultados de NIBP, cambios de alarma o
+    estado).
+    """
+
+    def __init__(self):
+        self.data = asyncio.Event()
+        self.urgent = asyncio.Event()
+        self._loop = None
+        self._thread_id = None
+        self._scheduled = False
+
+    def bind(self, loop: asyncio.AbstractEventLoop = None) -> None:
+        self._loop = loop or asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+
+    def notify(self, urgent: bool = False) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+        if threading.get_ident() == self._thread_id:
+            self._set(urgent)
+        elif urgent or not self._scheduled:
+            self._scheduled = True
+            try:
+                loop.call_soon_threadsafe(self._set, urgent)
+            except RuntimeError:
+                # loop cerrado durante el apagado
+                self._scheduled = False
+
+    def clear(self) -> None:
+        self.data.clear()
+        self.urgent.clear()
+
+    def _set(self, urgent: bool) -> None:
+        self._scheduled = False
+        self.data.set()
+        if urgent:
+            self.urgent.set()
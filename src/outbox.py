@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Cola persistente (SQLite en modo WAL) para payloads que no se pudieron
+    enviar. Se acota por cantidad (``max_items``, se descartan los más
+    viejos) y por antigüedad (``max_age_sec``).
+
+    El disco nunca se toca desde el loop: todas las operaciones corren en
+    un único hilo propio, en el orden en que se pidieron. ``put`` solo
+    encola la escritura y vuelve (se llama desde el uploader en cada tick
+    fallido durante un corte); ``peek``/``remove``/``evict_expired`` son
+    corrutinas que esperan a ese hilo, así un drain ve todo lo encolado
+    antes. ``close`` espera las escrituras pendientes.
+    """
+
+    def __init__(self, path: Path, max_items: int = 20000, max_age_sec: float = 24 * 3600):
+        self.path = Path(path)
+        self.max_items = max_items
+        self.max_age_sec = max_age_sec
+        self.evicted = 0
+        self._conn = None
+        # cada contador lo escribe un solo hilo: puts el loop, el resto el del outbox
+        self._stored = 0
+        self._puts = 0
+        self._puts_done = 0
+        self._executor = None
+
+    # ---------- ciclo de vida ---------------------------------------------
+    def open(self) -> None:
+        self._pool().submit(self._open).result()
+
+    def close(self) -> None:
+        self._pool().submit(self._close).result()
+
+    def __len__(self) -> int:
+        # incluye lo encolado que todavía no llegó al disco
+        return self._stored + self._puts - self._puts_done
+
+    # ---------- API pública -----------------------------------------------
+    def put(self, payload: dict) -> None:
+        # se serializa acá: el dict puede cambiar después de volver
+        body = json.dumps(payload, separators=(",", ":"))
+        self._puts += 1
+        self._pool().submit(self._put, time.time(), body)
+
+    async def peek(self, limit: int) -> List[Tuple[int, dict]]:
+        """Los ``limit`` payloads más viejos, sin sacarlos de la cola."""
+        return await self._run(self._peek, limit)
+
+    async def remove(self, ids: List[int]) -> None:
+        if ids:
+            await self._run(self._remove, ids)
+
+    async def evict_expired(self) -> int:
+        return await self._run(self._evict_expired)
+
+    # ---------- Internos (hilo del outbox) ---------------------------------
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+
+    def _pool(self):
+        if self._executor is None:
+            # se importa al usarlo: concurrent.futures.thread no entra al arranque
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+        return self._executor
+
+    def _open(self) -> None:
+        if self._conn is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " created REAL NOT NULL,"
+            " payload TEXT NOT NULL)"
+        )
+        self._conn = conn
+        self._evict_expired()
+        self._stored = conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _put(self, created: float, body: str) -> None:
+        try:
+            self._open()
+            self._conn.execute(
+                "INSERT INTO outbox (created, payload) VALUES (?, ?)", (created, body)
+            )
+            self._stored += 1
+            excess = self._stored - self.max_items
+            if excess > 0:
+                self._delete_oldest(excess)
+        except Exception as e:
+            log.error("Outbox write failed, payload lost: %s", e)
+        finally:
+            self._puts_done += 1
+
+    def _peek(self, limit: int) -> List[Tuple[int, dict]]:
+        self._open()
+        rows = self._conn.execute(
+            "SELECT id, payload FROM outbox ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def _remove(self, ids: List[int]) -> None:
+        self._open()
+        cur = self._conn.executemany(
+            "DELETE FROM outbox WHERE id = ?", [(i,) for i in ids]
+        )
+        self._stored = max(self._stored - cur.rowcount, 0)
+
+    def _evict_expired(self) -> int:
+        self._open()
+        cur = self._conn.execute(
+            "DELETE FROM outbox WHERE created < ?", (time.time() - self.max_age_sec,)
+        )
+        removed = max(cur.rowcount, 0)
+        self._stored = max(self._stored - removed, 0)
+        self.evicted += removed
+        return removed
+
+    def _delete_oldest(self, n: int) -> None:
+        cur = self._conn.execute(
+            "DELETE FROM outbox WHERE id IN"
+            " (SELECT id FROM outbox ORDER BY id LIMIT ?)",
+            (n,),
+        )
+        removed = max(cur.rowcount, 0)
+        self._stored -= removed
+        self.evicted += removed
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+
+class TaskStats:
+    __slots__ = ("starts", "failures", "last_error", "started_at", "running")
+
+    def __init__(self):
+        self.starts = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.started_at = 0.0
+        self.running = False
+
+    def as_dict(self) -> dict:
+        uptime = time.monotonic() - self.started_at if self.running else 0.0
+        return {
+            "running": self.running,
+            "starts": self.starts,
+            "restarts": max(self.starts - 1, 0),
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "uptime": round(uptime, 1),
+        }
+
+
+class _Service:
+    __slots__ = ("factory", "restart", "restart_delay", "task", "stats", "restarting")
+
+    def __init__(self, factory, restart: bool, restart_delay: float):
+        self.factory = factory
+        self.restart = restart
+        self.restart_delay = restart_delay
+        self.task: Optional[asyncio.Task] = None
+        self.stats = TaskStats()
+        self.restarting = False
+
+
+class ServiceRuntime:
+    """
+    Dueño de las tareas de larga vida del proceso (transportes, senders,
+    comandos, uploader, Pusher) sobre un ``asyncio.TaskGroup``.
+
+    – ``add(name, factory)`` registra un servicio (``factory()`` -> corrutina)
+    – ``run()`` los arranca todos y vuelve cuando terminan o tras ``stop()``
+    – ``restart(name)`` cancela la instancia actual y la vuelve a crear
+    – un servicio que falla se recrea tras ``restart_delay``; con
+      ``restart=False`` la excepción baja todo el grupo
+
+    Cada servicio existe una sola vez: reconectar no duplica tareas.
+    """
+
+    def __init__(self):
+        self._services: Dict[str, _Service] = {}
+        self._group: Optional[asyncio.TaskGroup] = None
+        self._stopping = False
+
+    def add(
+        self,
+        name: str,
+        factory: Callable[[], Awaitable],
+        restart: bool = True,
+        restart_delay: float = 1.0,
+    ) -> None:
+        if name in self._services:
+            raise ValueError(f"service {name!r} already registered")
+        service = _Service(factory, restart, restart_delay)
+        self._services[name] = service
+        if self._group is not None:
+            self._group.create_task(self._supervise(name, service), name=name)
+
+    async def run(self) -> None:
+        self._stopping = False
+        try:
+            async with asyncio.TaskGroup() as group:
+                self._group = group
+                for name, service in self._services.items():
+                    group.create_task(self._supervise(name, service), name=name)
+        finally:
+            self._group = None
+
+    def stop(self) -> None:
+        self._stopping = True
+        for service in self._services.values():
+            if service.task is not None:
+                service.task.cancel()
+
+    def restart(self, name: str) -> None:
+        service = self._services[name]
+        if service.task is not None:
+            service.restarting = True
+            service.task.cancel()
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: s.stats.as_dict() for name, s in self._services.items()}
+
+    async def _supervise(self, name: str, service: _Service) -> None:
+        stats = service.stats
+        while not self._stopping:
+            stats.starts += 1
+            stats.started_at = time.monotonic()
+            stats.running = True
+            service.task = asyncio.create_task(service.factory(), name=f"{name}:run")
+            try:
+                await service.task
+                return                          # terminó normalmente
+            except asyncio.CancelledError:
+                if not service.restarting or self._stopping:
+                    raise                       # stop() o cancelaron al grupo
+                service.restarting = False
+                log.warning("[RUNTIME] %s restarted", name)
+            except Exception as e:
+                stats.failures += 1
+                stats.last_error = repr(e)
+                log.error("[RUNTIME] %s failed: %r", name, e)
+                if not service.restart:
+                    raise
+                await asyncio.sleep(service.restart_delay)
+            finally:
+                stats.running = False
+                service.task = None
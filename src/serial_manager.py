@@ -1,4 +1,9 @@
-import serial, threading, time, asyncio
+import logging
+import serial, threading, time, asyncio, os
+
+from src.metrics import Histogram
+
+log = logging.getLogger(__name__)
 
 HEADER = b"\x55\xAA"
 
@@ -20,14 +25,34 @@ class PM6750USBReader:
 
     Mantiene la misma interfaz que el Bluetooth para que la app
     no tenga que distinguir el tipo de conexión.
+
+    transport:
+      "asyncio" – el fd del puerto se registra con loop.add_reader y el
+                  parser se alimenta en el hilo del loop (solo POSIX)
+      "thread"  – hilo lector con ser.read() bloqueante (Windows)
+      "auto"    – asyncio en POSIX, thread en el resto
     """
-    def __init__(self, parser, port="COM4", baud=115200):
+    READ_SIZE = 4096
+    READ_SIZE_BUCKETS = (1, 8, 32, 128, 512, 1024, 4096)
+
+    def __init__(self, parser, port="COM4", baud=115200, transport="auto"):
         self.parser = parser
         self.port   = port
         self.baud   = baud
         self.ser    = None
         self._run   = False
         self._t     = None              # hilo de lectura
+        if transport == "auto":
+            transport = "asyncio" if os.name == "posix" else "thread"
+        self.transport = transport
+        self._aio_loop = None           # loop con el reader registrado
+        self._fd = None
+        self.connected = False          # False si el puerto se cayó
+        self.last_data_timestamp = 0    # time.monotonic() del último chunk
+        self.chunks_received = 0        # lecturas con datos (métricas)
+        self.bytes_received = 0
+        self.read_sizes = Histogram(self.READ_SIZE_BUCKETS)
+        self.capture = None             # CaptureWriter opcional (src.capture)
         self.nibp_running = False       # ← flag
         self._nibp_timeout_task = None
 
@@ -59,7 +84,13 @@ class PM6750USBReader:
     async def connect(self) -> bool:
         """Abre el puerto y arranca la lectura (async para la app)."""
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._connect_sync)
+        if self.transport != "asyncio":
+            return await loop.run_in_executor(None, self._connect_sync)
+
+        if not await loop.run_in_executor(None, self._open_sync):
+            return False
+        self.start_monitoring()
+        return self._run
 
     def start_monitoring(self):
         # self.parser.reset_data()
@@ -73,13 +104,33 @@ class PM6750USBReader:
             self.ser.write(_cmd(a1, a2))
 
         self._run = True
-        self._t   = threading.Thread(target=self._loop, daemon=True)
-        self._t.start()
+        self.connected = True
+        if self.transport == "asyncio":
+            try:
+                self._attach_reader()
+            except Exception as e:
+                self._run = False
+                self.connected = False
+                log.warning("[USB] No se pudo registrar el lector asyncio: %s", e)
+                return
+        else:
+            self._t = threading.Thread(target=self._loop, daemon=True)
+            self._t.start()
         print("[USB] Lectura iniciada")
 
+    async def disconnect(self):
+        """Cierra el puerto (async, misma interfaz que el Bluetooth)."""
+        if self.transport == "asyncio":
+            self.stop_monitoring()
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, self.stop_monitoring)
+
     def stop_monitoring(self):
         self._run = False
+        self.connected = False
         self.nibp_running = False
+        if self._aio_loop is not None:
+            self._detach_reader()
         if self._t:
             self._t.join(timeout=1)
         if self.ser and self.ser.is_open:
@@ -135,16 +186,68 @@ class PM6750USBReader:
         # await loop.run_in_executor(None, self._start_nibp_sync)
 
     # ---------- Internos ---------------------------------------------------
-    def _connect_sync(self) -> bool:
+    def _open_sync(self) -> bool:
         try:
             self.ser = serial.Serial(self.port, self.baud, timeout=0.3)
             print(f"[USB] Puerto {self.port} abierto")
-            self.start_monitoring()
             return True
         except Exception as e:
             print(f"[USB] No se pudo abrir {self.port}: {e}")
             return False
 
+    def _connect_sync(self) -> bool:
+        if not self._open_sync():
+            return False
+        self.start_monitoring()
+        return True
+
+    def _attach_reader(self):
+        loop = asyncio.get_running_loop()
+        self._fd = self.ser.fileno()
+        os.set_blocking(self._fd, False)
+        loop.add_reader(self._fd, self._on_readable)
+        self._aio_loop = loop
+
+    def _detach_reader(self):
+        loop, fd = self._aio_loop, self._fd
+        self._aio_loop = None
+        if loop is None or fd is None or loop.is_closed():
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                loop.remove_reader(fd)
+                return
+        except RuntimeError:
+            pass
+        loop.call_soon_threadsafe(loop.remove_reader, fd)
+
+    def _on_readable(self):
+        """Lee todo lo disponible en el fd y lo pasa al parser (hilo del loop)."""
+        try:
+            data = os.read(self._fd, self.READ_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            log.error("[USB] Error de lectura: %s", e)
+            data = b""
+        if not data:
+            # EOF/hangup: el dispositivo se desconectó
+            log.warning("[USB] Puerto cerrado por el dispositivo")
+            self._run = False
+            self.connected = False
+            self._detach_reader()
+            return
+        self._received(data)
+        self.parser.add_data(data)
+
+    def _received(self, data):
+        self.last_data_timestamp = time.monotonic()
+        self.chunks_received += 1
+        self.bytes_received += len(data)
+        self.read_sizes.observe(len(data))
+        if self.capture is not None:
+            self.capture.write(data)
+
     def _start_nibp_sync(self):
         if self.ser and self.ser.is_open and not self.nibp_running:
             print("[USB] → start NIBP")
@@ -172,18 +275,15 @@ class PM6750USBReader:
                 pass
 
     def _loop(self):
-        buf = bytearray()
-        while self._run and self.ser and self.ser.is_open:
-            data = self.ser.read(256)
-            if not data:
-                continue
-            buf.extend(data)
-            while len(buf) >= 3:
-                if buf[:2] != HEADER:
-                    buf.pop(0); continue
-                n = buf[2]
-                if len(buf) < n + 3:
-                    break
-                frame = bytes(buf[: n + 3])
-                buf   = buf[n + 3:]
-                self.parser.add_data(frame)
+        # el parser hace el framing: se le pasan las lecturas crudas tal cual
+        ser = self.ser
+        while self._run and ser and ser.is_open:
+            try:
+                data = ser.read(ser.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                log.error("[USB] Error de lectura: %s", e)
+                self.connected = False
+                break
+            if data:
+                self._received(data)
+                self.parser.add_data(data)
@@ -0,0 +1,352 @@
+"""
+Simulador de un BerryMed PM-6750 para pruebas de carga sin hardware.
+
+    python -m src.simulator            # abre un pty e imprime el puerto
+    python -m src.simulator --corrupt 0.01 --garbage 0.01
+
+Con el puerto impreso se puede correr la app con ``DEVICE_CONNECTION:
+"usb"`` y ``DEVICE_PORT: "/dev/pts/N"``; en el mismo proceso se usa
+``DEVICE_CONNECTION: "sim"`` (``SimulatedTransport``).
+"""
+import asyncio
+import math
+import os
+import random
+import select
+import threading
+import time
+from typing import Dict, Optional
+
+HEADER = b"\x55\xAA"
+
+# frames/s por tipo de paquete con todo habilitado
+DEFAULT_RATES: Dict[int, float] = {
+    0x01: 250.0,    # ECG wave
+    0xFE: 100.0,    # SpO2 wave
+    0xFF: 125.0,    # RESP wave
+    0x02: 1.0,      # ECG params
+    0x04: 1.0,      # SpO2 params
+    0x05: 0.5,      # TEMP
+}
+# los picos 0x30/0x31 salen con cada latido (heart_rate)
+
+NIBP_CMD = 0x02
+
+
+def make_frame(packet_type: int, payload: bytes) -> bytes:
+    """Frame válido: 55 AA len tipo payload checksum (como ``_cmd``)."""
+    body = bytes([len(payload) + 3, packet_type]) + payload
+    return HEADER + body + bytes([~sum(body) & 0xFF])
+
+
+class DeviceSimulator:
+    """
+    Genera el stream de un monitor: ondas a frecuencia completa, parámetros,
+    picos a la frecuencia cardíaca y mediciones de NIBP a pedido.
+
+    – ``generate(dt)`` avanza el reloj simulado ``dt`` segundos y devuelve
+      los bytes que el equipo habría mandado en ese lapso
+    – ``feed(data)`` recibe lo que escribe el host (``_cmd``): NIBP
+      start/stop (tipo 0x02); el resto de los comandos solo se cuentan
+    – ``noise``: desvío de las muestras de onda; ``corrupt_rate``: fracción
+      de frames con un byte alterado (falla el checksum); ``garbage_rate``:
+      fracción de frames precedidos de basura (fuerza un resync)
+
+    Con la misma ``seed`` el stream es el mismo byte a byte.
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[int, float]] = None,
+        heart_rate: int = 72,
+        resp_rate: int = 16,
+        spo2: int = 98,
+        temperature: float = 36.6,
+        noise: float = 2.0,
+        corrupt_rate: float = 0.0,
+        garbage_rate: float = 0.0,
+        nibp_duration: float = 20.0,
+        nibp_result=(120, 93, 80),
+        seed: Optional[int] = None,
+    ):
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.heart_rate = heart_rate
+        self.resp_rate = resp_rate
+        self.spo2 = spo2
+        self.temperature = temperature
+        self.noise = noise
+        self.corrupt_rate = corrupt_rate
+        self.garbage_rate = garbage_rate
+        self.nibp_duration = nibp_duration
+        self.nibp_result = nibp_result
+        self.random = random.Random(seed)
+
+        self.now = 0.0
+        self._due: Dict[int, float] = dict.fromkeys(self.rates, 0.0)
+        self._beat_due = 0.0
+        self._commands = bytearray()
+        self.nibp_started: Optional[float] = None
+        self._nibp_due = 0.0
+        self._nibp_cancelled = False
+
+        self.frames = 0
+        self.corrupted = 0
+        self.garbage = 0
+        self.commands = 0
+
+    # ---------- host -> equipo -------------------------------------------
+    def feed(self, data: bytes) -> None:
+        buf = self._commands
+        buf.extend(data)
+        while True:
+            start = buf.find(HEADER)
+            if start < 0:
+                del buf[:max(len(buf) - 1, 0)]
+                return
+            if len(buf) - start < 3 or len(buf) - start < buf[start + 2] + 2:
+                del buf[:start]
+                return
+            end = start + buf[start + 2] + 2
+            frame = bytes(buf[start:end])
+            del buf[:end]
+            if ~sum(frame[2:-1]) & 0xFF != frame[-1]:
+                continue
+            self.commands += 1
+            if frame[3] == NIBP_CMD:
+                if frame[4]:
+                    self.start_nibp()
+                else:
+                    self.stop_nibp()
+
+    def start_nibp(self) -> None:
+        if self.nibp_started is None:
+            self.nibp_started = self.now
+            self._nibp_due = self.now
+
+    def stop_nibp(self) -> None:
+        self._nibp_cancelled = self.nibp_started is not None
+        self.nibp_started = None
+
+    # ---------- equipo -> host -------------------------------------------
+    def generate(self, dt: float) -> bytes:
+        end = self.now + dt
+        out = []
+        # se emite en orden temporal aproximado: paso de 1 ms
+        step = 0.001
+        while self.now < end:
+            self.now = min(self.now + step, end)
+            t = self.now
+            for packet_type, rate in self.rates.items():
+                if rate <= 0:
+                    continue
+                while self._due[packet_type] <= t:
+                    self._due[packet_type] += 1.0 / rate
+                    out.append(self._frame(packet_type, self._payload(packet_type, t)))
+            if self._beat_due <= t and self.heart_rate > 0:
+                self._beat_due += 60.0 / self.heart_rate
+                out.append(self._frame(0x30, b"\x00"))
+                out.append(self._frame(0x31, b"\x00"))
+            out.extend(self._nibp(t))
+        return b"".join(out)
+
+    def _frame(self, packet_type: int, payload: bytes) -> bytes:
+        frame = make_frame(packet_type, payload)
+        self.frames += 1
+        rnd = self.random
+        if self.corrupt_rate and rnd.random() < self.corrupt_rate:
+            self.corrupted += 1
+            pos = rnd.randrange(3, len(frame))
+            frame = frame[:pos] + bytes([frame[pos] ^ 0x5A]) + frame[pos + 1:]
+        if self.garbage_rate and rnd.random() < self.garbage_rate:
+            self.garbage += 1
+            # incluye medio header: el parser no se puede enganchar ahí
+            frame = bytes(rnd.randrange(256) for _ in range(rnd.randrange(1, 8))) + b"\x55" + frame
+        return frame
+
+    def _sample(self, value: float) -> int:
+        value += self.random.gauss(0, self.noise) if self.noise else 0
+        return max(0, min(255, int(value)))
+
+    def _payload(self, packet_type: int, t: float) -> bytes:
+        beat = (t * self.heart_rate / 60.0) % 1.0
+        if packet_type == 0x01:
+            # complejo QRS simplificado sobre la línea de base
+            qrs = 120 * math.exp(-((beat - 0.2) ** 2) / 0.0004)
+            return bytes([self._sample(128 + qrs)])
+        if packet_type == 0xFE:
+            return bytes([self._sample(100 + 60 * max(0.0, math.sin(2 * math.pi * beat)))])
+        if packet_type == 0xFF:
+            phase = 2 * math.pi * t * self.resp_rate / 60.0
+            return bytes([self._sample(128 + 50 * math.sin(phase))])
+        if packet_type == 0x02:
+            return bytes([0, self.heart_rate, self.resp_rate])
+        if packet_type == 0x04:
+            return bytes([0, self.spo2, self.heart_rate])
+        if packet_type == 0x05:
+            whole = int(self.temperature)
+            return bytes([0, whole, int(round((self.temperature - whole) * 10))])
+        return b"\x00"
+
+    def _nibp(self, t: float):
+        """
+        Paquetes 0x03: presión del manguito cada 0.5 s mientras mide
+        (resultado 1, en curso) y al final el resultado (0 = OK) o
+        cancelado (2) si llegó un stop.
+        """
+        if self._nibp_cancelled:
+            self._nibp_cancelled = False
+            return [self._frame(0x03, bytes([2 << 2, 0, 0, 0, 0]))]
+        if self.nibp_started is None or t < self._nibp_due:
+            return []
+        self._nibp_due = t + 0.5
+        elapsed = t - self.nibp_started
+        if elapsed >= self.nibp_duration:
+            self.nibp_started = None
+            sys_, mean, dia = self.nibp_result
+            return [self._frame(0x03, bytes([0, 0, sys_, mean, dia]))]
+        # infla hasta la mitad y después desinfla
+        half = self.nibp_duration / 2
+        cuff = 180 * (elapsed / half if elapsed < half else (self.nibp_duration - elapsed) / half)
+        return [self._frame(0x03, bytes([(1 << 2) | 1, int(cuff) // 2, 0, 0, 0]))]
+
+
+class SimulatedTransport:
+    """
+    Transporte en el mismo proceso con la interfaz de PM6750USBReader /
+    BMPatientMonitor: cada ``chunk_interval`` le pasa al parser lo que
+    generó el simulador. ``start_nibp`` escribe el mismo comando que el
+    lector USB.
+    """
+
+    def __init__(self, parser, simulator: Optional[DeviceSimulator] = None, chunk_interval: float = 0.02):
+        self.parser = parser
+        self.simulator = simulator or DeviceSimulator()
+        self.chunk_interval = chunk_interval
+        self.connected = False
+        self.last_data_timestamp = 0
+        self.chunks_received = 0
+        self.bytes_received = 0
+        self.capture = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> bool:
+        await self.disconnect()
+        self.connected = True
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    async def disconnect(self):
+        self.connected = False
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def start_nibp(self):
+        self.simulator.feed(make_frame(NIBP_CMD, b"\x01"))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        while True:
+            await asyncio.sleep(self.chunk_interval)
+            now = loop.time()
+            data = self.simulator.generate(now - last)
+            last = now
+            if not data:
+                continue
+            self.last_data_timestamp = time.monotonic()
+            self.chunks_received += 1
+            self.bytes_received += len(data)
+            if self.capture is not None:
+                self.capture.write(data)
+            self.parser.add_data(data)
+
+
+class PtySimulator:
+    """
+    El simulador detrás de un pseudo-terminal: ``port`` se abre con
+    pyserial como un puerto USB real. Un hilo escribe cada
+    ``chunk_interval`` y lee los comandos del host.
+    """
+
+    def __init__(self, simulator: Optional[DeviceSimulator] = None, chunk_interval: float = 0.01):
+        import pty
+        import tty
+
+        self.simulator = simulator or DeviceSimulator()
+        self.chunk_interval = chunk_interval
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "PtySimulator":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _run(self) -> None:
+        last = time.monotonic()
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._master], [], [], self.chunk_interval)
+            if readable:
+                try:
+                    self.simulator.feed(os.read(self._master, 4096))
+                except OSError:
+                    pass
+            now = time.monotonic()
+            if now - last < self.chunk_interval:
+                continue
+            data = self.simulator.generate(now - last)
+            last = now
+            try:
+                os.write(self._master, data)
+            except OSError:
+                pass                    # nadie tiene el puerto abierto
+
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Simulador BerryMed PM-6750 sobre un pty")
+    ap.add_argument("--noise", type=float, default=2.0)
+    ap.add_argument("--corrupt", type=float, default=0.0, help="fracción de frames corruptos")
+    ap.add_argument("--garbage", type=float, default=0.0, help="fracción de frames con basura antes")
+    ap.add_argument("--heart-rate", type=int, default=72)
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args()
+
+    sim = DeviceSimulator(
+        heart_rate=args.heart_rate,
+        noise=args.noise,
+        corrupt_rate=args.corrupt,
+        garbage_rate=args.garbage,
+        seed=args.seed,
+    )
+    pty_sim = PtySimulator(sim).start()
+    print(f"[SIM] PM-6750 simulado en {pty_sim.port} (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"[SIM] frames={sim.frames} corrupted={sim.corrupted} "
+                  f"garbage={sim.garbage} commands={sim.commands}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pty_sim.stop()
+
+
+if __name__ == "__main__":
+    main()
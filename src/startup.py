@@ -0,0 +1,58 @@
+"""
+Tiempos de arranque: desde que arranca app.py hasta el primer frame
+decodificado de cada equipo. En los tótems el watchdog reinicia el
+proceso, así que importa cuánto tarda en volver a tener datos.
+
+``t0`` es cuando se importa este módulo (la primera línea de app.py):
+no incluye el arranque del intérprete ni el desempaquetado del .exe
+one-file, que hay que medir desde afuera.
+"""
+import asyncio
+import importlib
+import logging
+import time
+from typing import Dict, Iterable
+
+log = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+        self._pending = set()
+        self.reported = False
+
+    def mark(self, name: str) -> None:
+        """Segundos desde ``t0``; solo cuenta la primera vez de cada nombre."""
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.t0
+
+    def expect(self, names: Iterable[str]) -> None:
+        """Equipos a esperar antes de loguear el reporte."""
+        self._pending = set(names)
+
+    def first_frame(self, name: str) -> None:
+        """Primer frame de un equipo (puede llamarse desde el hilo lector)."""
+        self.mark(f"{name}.first_frame")
+        self._pending.discard(name)
+        if not self._pending and not self.reported:
+            self.reported = True
+            log.info("[STARTUP] %s", self.summary())
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {sec * 1000:.0f} ms" for name, sec in self.marks.items())
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(self.marks)
+
+
+startup = StartupTimer()
+
+
+async def import_later(name: str):
+    """
+    Importa un módulo pesado (aiohttp, pysher) en un hilo: el loop sigue
+    leyendo los equipos mientras tanto.
+    """
+    return await asyncio.to_thread(importlib.import_module, name)
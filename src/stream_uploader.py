@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Callable, Optional
+
+from src.startup import import_later
+from src.uploader import LatencyHistogram
+
+log = logging.getLogger(__name__)
+
+
+class StreamLatencyHistogram(LatencyHistogram):
+    """Como el del POST, con buckets finos por debajo de 100 ms."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    __slots__ = ()
+
+
+class StreamUploader:
+    """
+    Uplink por WebSocket (``UPLINK: "websocket"``): una conexión persistente
+    en lugar de un POST por payload. Tiene la interfaz de VitalsUploader que
+    usan los equipos (``submit``/``stats``); ``run()`` es un servicio del
+    runtime que conecta y reconecta.
+
+    Protocolo, un mensaje JSON por frame de texto::
+
+        cliente -> {"type": "hello", "stream": id, "lastSeq": n}
+        server  -> {"type": "welcome", "ack": m}     último seq recibido de ``stream``
+        cliente -> {"type": "data", "seq": n, "payload": {...}}
+        server  -> {"type": "ack", "seq": n}         acumulativo
+
+    ``stream`` identifica al proceso (los seq arrancan de 1 en cada
+    arranque). Lo no confirmado queda en memoria y al reconectar se
+    reenvía desde ``ack + 1``. Con ``max_pending`` mensajes sin confirmar
+    ``submit`` rechaza (backpressure) y el payload va a ``on_failure`` (el
+    outbox), igual que con la ventana llena del POST. El heartbeat es el
+    ping/pong de aiohttp: una conexión muda se cierra y se reconecta.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        auth_token: str,
+        max_pending: int = 512,
+        heartbeat: float = 10.0,
+        handshake_timeout: float = 5.0,
+        compress: bool = False,
+        reconnect_base: float = 0.5,
+        reconnect_max: float = 10.0,
+        on_failure: Optional[Callable[[dict], None]] = None,
+    ):
+        self.url = url
+        self.max_pending = max_pending
+        self.heartbeat = heartbeat
+        self.handshake_timeout = handshake_timeout
+        self.compress = compress
+        self.reconnect_base = reconnect_base
+        self.reconnect_max = reconnect_max
+        self.on_failure = on_failure
+        self.set_auth_token(auth_token)
+
+        self.stream_id = uuid.uuid4().hex
+        self.ws = None
+        self._seq = 0
+        self._acked = 0
+        self._sent_upto = 0
+        # (seq, mensaje, on_success, on_spooled, payload, submitted_at), seq contiguos
+        self._pending = deque()
+        self._wakeup = asyncio.Event()
+
+        self.latency = StreamLatencyHistogram()     # submit -> ack del server
+        self.sent = 0
+        self.failed = 0                         # al outbox al cerrar
+        self.rejected = 0                       # backpressure
+        self.resent = 0
+        self.reconnects = 0
+
+    def set_auth_token(self, auth_token: str) -> None:
+        """Vale desde la próxima conexión."""
+        self._headers = {"Authorization": f"Basic {auth_token}"}
+
+    # ---------- API pública -----------------------------------------------
+    @property
+    def connected(self) -> bool:
+        return self.ws is not None and not self.ws.closed
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def submit(
+        self,
+        payload: dict,
+        on_success: Optional[Callable[[], None]] = None,
+        on_spooled: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """
+        Encola ``payload`` y vuelve enseguida; ``on_success`` se llama con el
+        ack del server y ``on_spooled`` si terminó en el outbox. False si hay
+        ``max_pending`` sin confirmar.
+        """
+        if len(self._pending) >= self.max_pending:
+            self.rejected += 1
+            self._fail(payload, on_spooled)
+            return False
+        self._seq += 1
+        message = json.dumps(
+            {"type": "data", "seq": self._seq, "payload": payload}, separators=(",", ":")
+        )
+        self._pending.append((self._seq, message, on_success, on_spooled, payload, time.monotonic()))
+        self._wakeup.set()
+        return True
+
+    def reconnect(self) -> None:
+        """Cierra la conexión actual (URL o credenciales nuevas); ``run`` reconecta."""
+        if self.ws is not None:
+            asyncio.ensure_future(self.ws.close())
+
+    async def run(self) -> None:
+        aiohttp = await import_later("aiohttp")
+        attempt = 0
+        session = aiohttp.ClientSession()
+        try:
+            while True:
+                try:
+                    async with session.ws_connect(
+                        self.url,
+                        headers=self._headers,
+                        heartbeat=self.heartbeat,
+                        compress=15 if self.compress else 0,
+                    ) as ws:
+                        await self._handshake(ws)
+                        self.ws = ws
+                        attempt = 0
+                        log.info("[STREAM] Connected to %s, resuming after seq %s", self.url, self._acked)
+                        await self._serve(ws, aiohttp.WSMsgType.TEXT)
+                    log.warning("[STREAM] Connection closed (%s), reconnecting", ws.close_code)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.warning("[STREAM] Connection to %s failed: %s", self.url, e)
+                finally:
+                    self.ws = None
+                self.reconnects += 1
+                delay = min(self.reconnect_max, self.reconnect_base * (2 ** attempt))
+                attempt += 1
+                await asyncio.sleep(delay)
+        finally:
+            await session.close()
+            # lo que quedó sin confirmar no se pierde: al outbox
+            while self._pending:
+                self.failed += 1
+                _, _, _, on_spooled, payload, _ = self._pending.popleft()
+                self._fail(payload, on_spooled)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "sent": self.sent,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "resent": self.resent,
+            "reconnects": self.reconnects,
+            "pending": self.in_flight,
+            "latency_p50": self.latency.quantile(0.5),
+            "latency_p99": self.latency.quantile(0.99),
+        }
+
+    # ---------- Internos ---------------------------------------------------
+    async def _handshake(self, ws) -> None:
+        await ws.send_str(json.dumps({"type": "hello", "stream": self.stream_id, "lastSeq": self._seq}))
+        msg = await ws.receive(timeout=self.handshake_timeout)
+        welcome = json.loads(msg.data) if isinstance(msg.data, str) else None
+        if not welcome or welcome.get("type") != "welcome":
+            raise ConnectionError(f"unexpected handshake reply {msg.type}: {msg.data!r}")
+        self._ack(int(welcome.get("ack", 0)))
+        # todo lo posterior al ack del server se (re)envía
+        self.resent += max(0, self._sent_upto - self._acked)
+        self._sent_upto = self._acked
+
+    async def _serve(self, ws, text_type) -> None:
+        writer = asyncio.ensure_future(self._write(ws))
+        try:
+            async for msg in ws:
+                if msg.type != text_type:
+                    continue
+                data = json.loads(msg.data)
+                if data.get("type") == "ack":
+                    self._ack(int(data["seq"]))
+        finally:
+            writer.cancel()
+            try:
+                await writer
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                log.warning("[STREAM] Write failed: %s", e)
+
+    async def _write(self, ws) -> None:
+        pending = self._pending
+        while True:
+            seq = self._sent_upto + 1
+            if pending and seq <= pending[-1][0]:
+                first = pending[0][0]
+                if seq < first:
+                    seq = first
+                try:
+                    # send_str espera el drain del socket: backpressure hacia acá
+                    await ws.send_str(pending[seq - first][1])
+                except ConnectionError:
+                    await ws.close()        # termina _serve y run() reconecta
+                    raise
+                self._sent_upto = seq
+            else:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+    def _ack(self, seq: int) -> None:
+        if seq <= self._acked:
+            return
+        self._acked = seq
+        now = time.monotonic()
+        pending = self._pending
+        while pending and pending[0][0] <= seq:
+            _, _, on_success, _, _, submitted_at = pending.popleft()
+            self.sent += 1
+            self.latency.observe(now - submitted_at)
+            if on_success is not None:
+                try:
+                    on_success()
+                except Exception as e:
+                    log.error("Stream ack handler: %s", e)
+
+    def _fail(self, payload: dict, on_spooled: Optional[Callable[[], None]] = None) -> None:
+        if self.on_failure is None:
+            return
+        try:
+            self.on_failure(payload)
+            if on_spooled is not None:
+                on_spooled()
+        except Exception as e:
+            log.error("Uploader failure handler: %s", e)
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+
+class LinkSupervisor:
+    """
+    Vigila un enlace ya conectado (BLE o USB) y detecta cortes silenciosos.
+
+    Cada ``check_interval`` segundos mide frames/s a partir de
+    ``parser.frames_decoded`` y mira ``monitor.last_data_timestamp``
+    (``time.monotonic()`` del último chunk) y ``monitor.connected``.
+    ``watch()`` vuelve con el motivo cuando el transporte se cayó o no
+    llegan datos hace más de ``stall_timeout`` segundos.
+    """
+
+    def __init__(self, monitor, parser, stall_timeout: float = 5.0, check_interval: float = 1.0):
+        self.monitor = monitor
+        self.parser = parser
+        self.stall_timeout = stall_timeout
+        self.check_interval = check_interval
+        self.fps = 0.0
+        self.chunk_rate = 0.0           # lecturas USB / notificaciones BLE por segundo
+        self.stalls = 0
+
+    async def watch(self) -> str:
+        connected_at = time.monotonic()
+        last_frames = self.parser.frames_decoded
+        last_chunks = getattr(self.monitor, "chunks_received", 0)
+        last_check = connected_at
+        while True:
+            await asyncio.sleep(self.check_interval)
+            now = time.monotonic()
+
+            frames = self.parser.frames_decoded
+            chunks = getattr(self.monitor, "chunks_received", 0)
+            elapsed = now - last_check
+            self.fps = (frames - last_frames) / elapsed
+            self.chunk_rate = (chunks - last_chunks) / elapsed
+            last_frames, last_chunks, last_check = frames, chunks, now
+
+            if not getattr(self.monitor, "connected", True):
+                self.stalls += 1
+                return "transport disconnected"
+
+            # el reloj arranca en la conexión: no cuentan datos viejos
+            last_data = max(self.monitor.last_data_timestamp, connected_at)
+            if now - last_data > self.stall_timeout:
+                self.stalls += 1
+                return f"no data for {now - last_data:.1f}s"
+
+    def stats(self) -> dict:
+        return {
+            "fps": round(self.fps, 1),
+            "chunk_rate": round(self.chunk_rate, 1),
+            "stalls": self.stalls,
+        }
@@ -0,0 +1,105 @@
+import time
+from typing import Dict, Optional, Tuple
+
+WAVEFORMS = ("spo2", "ecg", "resp")
+
+
+class DeltaTracker:
+    """
+    Arma payloads incrementales a partir del estado de un BMDataParser.
+
+    Cada payload lleva solo los signos vitales que cambiaron y las muestras
+    de onda nuevas desde el último envío confirmado (``ack``). Cada
+    ``keyframe_interval`` segundos, o cuando el parser se resetea, se manda
+    un keyframe con todos los signos vitales.
+    """
+
+    def __init__(self, parser, keyframe_interval: float = 30, vitals_format: str = "display"):
+        self.parser = parser
+        self.keyframe_interval = keyframe_interval
+        self.vitals_format = vitals_format      # ver BMDataParser.get_current_data
+        self.sequence = 0                       # seq del payload enviado
+
+        self._data_ref = None                   # parser.data confirmado
+        self._acked_seq = 0
+        self._acked_index: Dict[str, int] = dict.fromkeys(WAVEFORMS, 0)
+        self._last_keyframe = None
+
+    def restart(self) -> None:
+        """
+        Envío nuevo (START): el próximo payload es un keyframe y las ondas
+        arrancan en la posición actual de cada ring, sin las muestras que
+        quedaron de antes del START.
+        """
+        data = self.parser.data
+        self._data_ref = data
+        self._acked_seq = 0
+        self._acked_index = {name: data[name].total for name in WAVEFORMS}
+        self._last_keyframe = None
+
+    def build(self) -> Optional[Tuple[dict, tuple]]:
+        """
+        Devuelve ``(payload, marker)`` o ``None`` si no hay nada nuevo.
+        ``marker`` se pasa a ``ack`` cuando la API confirma el envío.
+        """
+        parser = self.parser
+        data = parser.data
+        now = time.monotonic()
+
+        if data is not self._data_ref:
+            # primer envío o reset_data(): arrancar de cero con un keyframe
+            self._data_ref = data
+            self._acked_seq = 0
+            self._acked_index = dict.fromkeys(WAVEFORMS, 0)
+            self._last_keyframe = None
+
+        keyframe = (
+            self._last_keyframe is None
+            or now - self._last_keyframe >= self.keyframe_interval
+        )
+
+        vitals = parser.vitals
+        since = None if keyframe else self._acked_seq
+        if self.vitals_format == "numeric":
+            payload_data = {"vitals": vitals.as_dict(since)}
+        else:
+            payload_data = {"vitalSigns": vitals.display(since)}
+        waveform_start = {}
+        totals = {}
+        has_samples = False
+        for name in WAVEFORMS:
+            ring = data[name]
+            samples = ring.since(self._acked_index[name])
+            totals[name] = ring.total
+            waveform_start[name] = ring.total - len(samples)
+            payload_data[name] = samples.tolist()
+            has_samples = has_samples or len(samples) > 0
+
+        if not has_samples:
+            if not keyframe and not vitals.changed_since(self._acked_seq):
+                return None
+            if keyframe and not parser.seq:
+                return None                     # todavía no se midió nada
+
+        self.sequence += 1
+        payload = {
+            "timestamp": int(time.time() * 1000),
+            "seq": self.sequence,
+            "keyframe": keyframe,
+            "waveformStart": waveform_start,
+            "data": payload_data,
+        }
+        marker = (data, parser.seq, totals, now if keyframe else None)
+        return payload, marker
+
+    def ack(self, marker: tuple) -> None:
+        """Marca como entregado todo lo incluido en el payload de ``marker``."""
+        data, seq, totals, keyframe_time = marker
+        if data is not self._data_ref:
+            return
+        self._acked_seq = max(self._acked_seq, seq)
+        for name, total in totals.items():
+            if total > self._acked_index[name]:
+                self._acked_index[name] = total
+        if keyframe_time is not None:
+            self._last_keyframe = keyframe_time
@@ -0,0 +1,276 @@
+import asyncio
+import gzip
+import json
+import logging
+import random
+import time
+from typing import Callable, Optional
+
+from src.metrics import Histogram
+from src.startup import import_later
+
+log = logging.getLogger(__name__)
+
+
+class LatencyHistogram(Histogram):
+    """Histograma acumulado de latencias (segundos) con buckets fijos."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    __slots__ = ()
+
+
+class VitalsUploader:
+    """
+    Envía payloads a la API de signos vitales sin bloquear el tick de 1 Hz.
+
+    – una sesión aiohttp persistente (keep-alive, límite de conexiones, DNS cacheado)
+    – headers armados una sola vez, body JSON compacto y opcionalmente gzip
+    – ventana de concurrencia acotada: ``submit`` no espera la respuesta
+    – reintentos con backoff exponencial con jitter dentro de cada envío
+    – histograma de latencia por request
+
+    Uso: ``async with uploader: ... uploader.submit(payload)``
+    """
+
+    RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        api_url: str,
+        auth_token: str,
+        max_in_flight: int = 4,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        timeout: float = 10.0,
+        compress: bool = False,
+        compress_min_size: int = 1024,
+        on_failure: Optional[Callable[[dict], None]] = None,
+    ):
+        self.api_url = api_url
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.compress = compress
+        self.compress_min_size = compress_min_size
+        self.on_failure = on_failure
+
+        self.set_auth_token(auth_token)
+
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self._tasks = set()
+        self._draining = 0      # POSTs del drain en curso (ocupan la ventana)
+
+        self.latency = LatencyHistogram()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rejected = 0       # ventana llena
+        self.drained = 0        # payloads reenviados desde el outbox
+
+    # ---------- ciclo de vida ---------------------------------------------
+    def set_auth_token(self, auth_token: str) -> None:
+        """Credenciales nuevas (recarga de config): valen desde el próximo POST."""
+        self._headers = {
+            "Authorization": f"Basic {auth_token}",
+            "Content-Type": "application/json",
+        }
+        self._gzip_headers = {**self._headers, "Content-Encoding": "gzip"}
+
+    async def start(self) -> None:
+        if self.session is not None:
+            return
+        # aiohttp es lo más pesado del arranque: se importa recién acá
+        aiohttp = await import_later("aiohttp")
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def close(self, grace: float = 2.0) -> None:
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=grace)
+            for task in pending:
+                task.cancel()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # ---------- API pública -----------------------------------------------
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks) + self._draining
+
+    def submit(
+        self,
+        payload: dict,
+        on_success: Optional[Callable[[], None]] = None,
+        on_spooled: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """
+        Agenda el envío de ``payload`` y vuelve enseguida. Devuelve False si
+        la ventana de concurrencia está llena (el payload va a ``on_failure``).
+        ``on_spooled`` se llama si el payload terminó en ``on_failure`` (el
+        outbox), que desde ahí se encarga de entregarlo.
+        """
+        if self.session is None or self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            self._fail(payload, on_spooled)
+            return False
+        task = asyncio.create_task(self._deliver(payload, on_success, on_spooled))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def post(self, payload: dict, url: Optional[str] = None) -> bool:
+        """Un único POST esperando la respuesta; True si la API devolvió 200."""
+        if self.session is None:
+            return False
+        body, headers = self._encode(payload)
+        try:
+            return await self._post_once(url or self.api_url, body, headers) == 200
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("Upload failed: %s", e)
+            return False
+
+    async def drain_outbox(
+        self,
+        outbox,
+        bulk_url: Optional[str] = None,
+        batch_size: int = 50,
+        interval: float = 5.0,
+    ) -> None:
+        """
+        Reenvía lo acumulado en ``outbox`` cuando vuelve la conectividad.
+        Con ``bulk_url`` cada lote va en un solo POST ``{"items": [...]}``;
+        si no, se mandan varios payloads a la vez al endpoint normal.
+        Corta al primer error y reintenta en ``interval`` segundos.
+
+        Los POSTs del drain ocupan la misma ventana que ``submit`` y dejan
+        libre la mitad (al menos un lugar): con mucho acumulado, el envío en
+        vivo no queda esperando una conexión detrás del drain.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            if self.session is None or not len(outbox):
+                continue
+            try:
+                await outbox.evict_expired()
+                while len(outbox):
+                    slots = self._drain_slots()
+                    if slots <= 0:
+                        await asyncio.sleep(0.05)   # ventana ocupada por lo en vivo
+                        continue
+                    batch = await outbox.peek(batch_size if bulk_url else slots)
+                    if not batch:
+                        break
+                    used = 1 if bulk_url else len(batch)
+                    self._draining += used
+                    try:
+                        if bulk_url:
+                            ok = await self.post({"items": [p for _, p in batch]}, bulk_url)
+                            done = [row_id for row_id, _ in batch] if ok else []
+                        else:
+                            results = await asyncio.gather(
+                                *(self.post(p) for _, p in batch)
+                            )
+                            done = [row_id for (row_id, _), ok in zip(batch, results) if ok]
+                    finally:
+                        self._draining -= used
+                    await outbox.remove(done)
+                    self.drained += len(done)
+                    if len(done) < len(batch):
+                        break
+                    # ceder el loop entre lotes para no frenar el tick en vivo
+                    await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("Outbox drain error: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "drained": self.drained,
+            "in_flight": self.in_flight,
+            "latency_p50": self.latency.quantile(0.5),
+            "latency_p99": self.latency.quantile(0.99),
+        }
+
+    # ---------- Internos ---------------------------------------------------
+    def _drain_slots(self) -> int:
+        # la mitad de la ventana (al menos un lugar) queda para submit
+        reserved = max(self.max_in_flight // 2, 1) if self.max_in_flight > 1 else 0
+        return min(self.max_in_flight - reserved - self._draining, self.max_in_flight - self.in_flight)
+
+    def _encode(self, payload: dict):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        if self.compress and len(body) >= self.compress_min_size:
+            return gzip.compress(body, compresslevel=5), self._gzip_headers
+        return body, self._headers
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _fail(self, payload: dict, on_spooled: Optional[Callable[[], None]] = None) -> None:
+        if self.on_failure is None:
+            return
+        try:
+            self.on_failure(payload)
+            if on_spooled is not None:
+                on_spooled()
+        except Exception as e:
+            log.error("Uploader failure handler: %s", e)
+
+    async def _post_once(self, url: str, body: bytes, headers: dict) -> int:
+        started = time.monotonic()
+        async with self.session.post(url, data=body, headers=headers) as response:
+            await response.read()
+            self.latency.observe(time.monotonic() - started)
+            return response.status
+
+    async def _deliver(self, payload: dict, on_success, on_spooled) -> None:
+        body, headers = self._encode(payload)
+        for attempt in range(self.max_retries):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt - 1))
+            try:
+                status = await self._post_once(self.api_url, body, headers)
+                if status == 200:
+                    self.sent += 1
+                    log.debug("Vital signs sent successfully")
+                    if on_success is not None:
+                        on_success()
+                    return
+                log.error("API returned status %s", status)
+                if status not in self.RETRYABLE_STATUS:
+                    break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Upload attempt %d failed: %s", attempt + 1, e)
+
+        self.failed += 1
+        log.error("Failed to send data after %d attempts", attempt + 1)
+        self._fail(payload, on_spooled)
@@ -0,0 +1,119 @@
+import time
+from typing import Dict, Optional
+
+# signos vitales tal como los manda el monitor: None = todavía no llegó
+# (o SpO2 fuera de rango), 0 = el monitor informa que no hay medición
+FIELDS = (
+    "heart_rate", "resp_rate", "spo2", "pulse_rate", "temperature",
+    "nibp_sys", "nibp_mean", "nibp_dia",
+)
+# byte de estado crudo del último paquete de cada tipo
+STATUS = ("ecg_status", "spo2_status", "temp_status", "nibp_status")
+
+# campo -> clave en el payload numérico (VITALS_FORMAT "numeric")
+NUMERIC_KEYS = {
+    "heart_rate": "heartRate",
+    "resp_rate": "respRate",
+    "spo2": "spo2",
+    "pulse_rate": "pulseRate",
+    "temperature": "temperature",
+    "nibp_sys": "nibpSys",
+    "nibp_mean": "nibpMean",
+    "nibp_dia": "nibpDia",
+}
+# clave de "vitalSigns" (VITALS_FORMAT "display") -> campos de los que sale
+DISPLAY_KEYS = (
+    ("heartRate", ("heart_rate",)),
+    ("nibp", ("nibp_sys", "nibp_dia")),
+    ("spo2Pulse", ("spo2", "pulse_rate")),
+    ("temperature", ("temperature",)),
+    ("respRate", ("resp_rate",)),
+)
+
+
+# textos de pantalla de siempre: "- -" sin lectura todavía, "-" para un 0
+def _text(value) -> str:
+    return "-" if not value else str(value)
+
+
+def _single(value) -> str:
+    return "- -" if value is None else _text(value)
+
+
+def _pair(a, b) -> str:
+    if a is None and b is None:
+        return "- - /- -"
+    return f"{_text(a)}/{_text(b)}"
+
+
+class VitalsRecord:
+    """
+    Últimos signos vitales de un equipo como números. El parser solo
+    guarda valores; los textos de pantalla (``"- -"``, ``"98/72"``) se arman
+    en ``display()``, cuando se serializa el payload, y ``as_dict()`` manda
+    los 0 como ``null``.
+
+    ``updated_at[campo]`` es el ``time.time()`` de la última lectura del
+    campo (cambie o no) y ``seq[campo]`` el ``parser.seq`` de su último
+    cambio (también de los bytes de estado), para el envío incremental.
+    """
+
+    __slots__ = FIELDS + STATUS + ("updated_at", "seq")
+
+    def __init__(self):
+        for name in FIELDS + STATUS:
+            setattr(self, name, None)
+        self.updated_at: Dict[str, float] = {}
+        self.seq: Dict[str, int] = dict.fromkeys(FIELDS + STATUS, 0)
+
+    def has_values(self) -> bool:
+        """Algún signo vital con medición válida (ni None ni 0)."""
+        return any(getattr(self, name) for name in FIELDS)
+
+    def changed_since(self, seq: int) -> bool:
+        return any(value > seq for value in self.seq.values())
+
+    def age(self, name: str) -> Optional[float]:
+        """Segundos desde la última lectura de ``name`` (None si nunca llegó)."""
+        updated = self.updated_at.get(name)
+        return None if updated is None else time.time() - updated
+
+    def display(self, since: Optional[int] = None) -> Dict[str, str]:
+        """
+        ``vitalSigns`` con el formato de siempre. Con ``since`` solo las
+        claves con algún campo cambiado después de ese seq.
+        """
+        seq = self.seq
+        out = {}
+        for key, fields in DISPLAY_KEYS:
+            if since is not None and all(seq[name] <= since for name in fields):
+                continue
+            if len(fields) == 1:
+                out[key] = _single(getattr(self, fields[0]))
+            else:
+                out[key] = _pair(getattr(self, fields[0]), getattr(self, fields[1]))
+        return out
+
+    def as_dict(self, since: Optional[int] = None) -> dict:
+        """
+        Números (``null`` si falta o el monitor mandó 0), ``updatedAt`` en ms epoch y los bytes
+        de estado. Con ``since`` solo los campos cambiados después de ese seq.
+        """
+        seq = self.seq
+        out = {
+            key: getattr(self, name) or None
+            for name, key in NUMERIC_KEYS.items()
+            if since is None or seq[name] > since
+        }
+        updated = self.updated_at
+        out["updatedAt"] = {
+            NUMERIC_KEYS[name]: int(updated[name] * 1000)
+            for name in NUMERIC_KEYS
+            if name in updated and NUMERIC_KEYS[name] in out
+        }
+        out["status"] = {name[:-7]: getattr(self, name) for name in STATUS}
+        return out
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in FIELDS)
+        return f"VitalsRecord({values})"
@@ -0,0 +1,81 @@
+from array import array
+
+
+class WaveformRing:
+    """
+    Buffer circular de capacidad fija para una onda (muestras uint8).
+
+    Cada muestra se escribe dos veces (en ``i`` y en ``i + capacity``), así
+    las últimas ``n`` muestras siempre quedan contiguas y ``snapshot()``
+    devuelve un ``memoryview`` sin copiar. La memoria queda acotada a
+    ``2 * capacity`` bytes sin importar cuánto dure la sesión.
+    """
+
+    __slots__ = ("capacity", "total", "_buf", "_pos")
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.total = 0                   # muestras escritas desde el inicio
+        self._buf = array("B", bytes(2 * capacity))
+        self._pos = 0                    # próxima posición de escritura
+
+    def __len__(self) -> int:
+        return self.total if self.total < self.capacity else self.capacity
+
+    def append(self, value: int) -> None:
+        pos = self._pos
+        buf = self._buf
+        buf[pos] = value
+        buf[pos + self.capacity] = value
+        pos += 1
+        self._pos = 0 if pos == self.capacity else pos
+        self.total += 1
+
+    def extend(self, values) -> None:
+        count = len(values)
+        if not count:
+            return
+        if not isinstance(values, array):
+            values = array("B", values)
+
+        cap = self.capacity
+        if count > cap:
+            values = values[count - cap:]
+        n = len(values)
+
+        buf = self._buf
+        pos = self._pos
+        first = min(n, cap - pos)
+        head = values[:first]
+        buf[pos:pos + first] = head
+        buf[pos + cap:pos + cap + first] = head
+        rest = n - first
+        if rest:
+            tail = values[first:]
+            buf[0:rest] = tail
+            buf[cap:cap + rest] = tail
+
+        self._pos = (pos + n) % cap
+        self.total += count
+
+    def snapshot(self, count: int = None) -> memoryview:
+        """
+        Últimas ``count`` muestras (todas las disponibles por defecto) como
+        ``memoryview`` sobre el buffer interno: no copia, pero las próximas
+        escrituras lo van pisando, así que hay que consumirlo en el momento.
+        """
+        available = len(self)
+        if count is None or count > available:
+            count = available
+        end = self._pos + self.capacity
+        return memoryview(self._buf)[end - count:end]
+
+    def since(self, index: int) -> memoryview:
+        """Muestras con índice absoluto ``>= index`` que aún estén en el buffer."""
+        return self.snapshot(max(self.total - index, 0))
+
+    def clear(self) -> None:
+        self.total = 0
+        self._pos = 0
@@ -0,0 +1,116 @@
+"""
+Codificación compacta de ondas para el payload (``WAVEFORM_ENCODING``).
+
+En JSON cada muestra (un byte, 0-255) ocupa 3-4 bytes de texto. Con una
+codificación binaria cada canal pasa a ser un objeto::
+
+    {"encoding": "delta", "sampleRate": 250, "start": 1200, "count": 250,
+     "data": "<base64>"}
+
+– ``u8``: las muestras tal cual, un byte cada una
+– ``delta``: diferencia con la muestra anterior (la primera, con 0) en
+  zig-zag + varint; las ondas cambian poco entre muestras, así que casi
+  todo entra en un byte y comprime mucho mejor con gzip
+
+``start`` es el índice absoluto de la primera muestra (como
+``waveformStart`` en modo delta). ``encode_samples``/``decode_samples``
+trabajan con los bloques binarios crudos, para transportes que no son JSON.
+"""
+import base64
+from array import array
+from operator import sub
+from typing import Dict, Tuple
+
+ENCODINGS = ("json", "u8", "delta")
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+# delta (-255..255) -> zig-zag varint (0, -1, 1, -2, 2... -> 0, 1, 2, 3, 4...);
+# los negativos caen en la otra punta de la lista, así que se indexa con delta
+_ZIGZAG = [b""] * 511
+for _delta in range(-255, 256):
+    _ZIGZAG[_delta] = _varint(_delta << 1 if _delta >= 0 else (-_delta << 1) - 1)
+
+
+def _delta_varint(samples) -> bytes:
+    samples = bytes(samples)
+    previous = b"\x00" + samples[:-1]
+    return b"".join(map(_ZIGZAG.__getitem__, map(sub, samples, previous)))
+
+
+def _undelta_varint(data: bytes) -> array:
+    samples = array("B")
+    append = samples.append
+    prev = value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        prev += value >> 1 if not value & 1 else -((value + 1) >> 1)
+        append(prev)
+        value = shift = 0
+    if shift:
+        raise ValueError("truncated varint")
+    return samples
+
+
+def encode_samples(samples, encoding: str) -> bytes:
+    """Bloque binario de un canal (``samples``: bytes, array('B'), memoryview o lista)."""
+    if encoding == "u8":
+        return bytes(samples)
+    if encoding == "delta":
+        return _delta_varint(samples)
+    raise ValueError(f"unknown waveform encoding {encoding!r}")
+
+
+def decode_samples(data: bytes, encoding: str) -> array:
+    if encoding == "u8":
+        return array("B", data)
+    if encoding == "delta":
+        return _undelta_varint(data)
+    raise ValueError(f"unknown waveform encoding {encoding!r}")
+
+
+def encode_channel(samples, encoding: str, sample_rate: int, start: int) -> dict:
+    """Objeto JSON de un canal con el bloque en base64."""
+    return {
+        "encoding": encoding,
+        "sampleRate": sample_rate,
+        "start": start,
+        "count": len(samples),
+        "data": base64.b64encode(encode_samples(samples, encoding)).decode("ascii"),
+    }
+
+
+def decode_channel(channel) -> Tuple[array, int, int]:
+    """
+    ``(muestras, start, sampleRate)`` de un canal. Acepta también la lista
+    JSON de siempre (``start`` y ``sampleRate`` quedan en 0).
+    """
+    if isinstance(channel, list):
+        return array("B", channel), 0, 0
+    samples = decode_samples(base64.b64decode(channel["data"]), channel["encoding"])
+    if len(samples) != channel["count"]:
+        raise ValueError(f"expected {channel['count']} samples, decoded {len(samples)}")
+    return samples, channel["start"], channel["sampleRate"]
+
+
+def decode_payload(payload: dict, waveforms=("spo2", "ecg", "resp")) -> dict:
+    """
+    Copia de ``payload`` con las ondas de vuelta como listas, como las
+    manda ``WAVEFORM_ENCODING: "json"`` (para pruebas y del lado del server).
+    """
+    data: Dict = dict(payload["data"])
+    for name in waveforms:
+        if name in data:
+            data[name] = decode_channel(data[name])[0].tolist()
+    return {**payload, "data": data}